@@ -4,59 +4,35 @@
 
 from cat.mad_hatter.decorators import tool
 from cat.log import log
-from datetime import datetime
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import json
+import re
+import traceback
 
 
-@tool(return_direct=True)
-def allocate_functional_requirements(tool_input, cat):
-    """
-    Allocate Functional Safety Requirements to system components.
-    
-    Performs preliminary allocation of FSRs to:
-    - Hardware components (sensors, actuators, ECUs)
-    - Software functions
-    - External systems (VCU, HMI, Gateway, etc.)
-    
-    Per ISO 26262-3:2018, Clause 7.4.3:
-    - Allocate FSRs to architectural elements
-    - Define interfaces between components
-    - Document allocation rationale
-    
-    Input: "allocate all FSRs" or "allocate FSR-XXX to [component]"
-    Example: "allocate all FSRs"
-    """
-    
-    print("✅ TOOL CALLED: allocate_functional_requirements")
-    
-    fsrs = cat.working_memory.get("fsc_functional_requirements", [])
-    
-    if not fsrs:
-        return """❌ No FSRs available.
+# FSRs per allocation prompt; override with working memory key "fsc_batch_size"
+ALLOCATION_BATCH_SIZE = 5
 
-**Required Steps:**
-1. Load HARA: `load HARA for [item name]`
-2. Develop strategy: `develop safety strategy for all goals`
-3. Derive FSRs: `derive FSRs for all goals`
-4. Allocate FSRs: `allocate all FSRs`
-"""
-    
-    input_str = str(tool_input).strip().lower()
-    
-    # Check if single FSR allocation
-    if ' to ' in input_str:
-        return allocate_single_fsr(tool_input, cat, fsrs)
-    
-    # Batch allocation for all FSRs
-    system_name = cat.working_memory.get("system_name", "the system")
-    safety_goals = cat.working_memory.get("fsc_safety_goals", [])
-    
-    log.info(f"🎯 Allocating {len(fsrs)} FSRs to system components")
-    
-    # Build allocation prompt
-    prompt = f"""You are allocating Functional Safety Requirements (FSRs) to system components per ISO 26262-3:2018, Clause 7.4.3.
+# Estimated tokens of FSR blocks per allocation prompt, keeps long FSR texts within the context window
+ALLOCATION_TOKEN_BUDGET = 6000
+
+# Concurrent LLM calls when allocating several batches
+ALLOCATION_LLM_WORKERS = 4
+
+# Most critical first, so each batch leads with its highest-ASIL FSRs
+ASIL_RANK = {'D': 4, 'C': 3, 'B': 2, 'A': 1}
+
+
+# ============================================================================
+# ALLOCATION PROMPT TEMPLATES
+# ============================================================================
+
+ALLOCATION_PROMPT_HEADER = """You are allocating Functional Safety Requirements (FSRs) to system components per ISO 26262-3:2018, Clause 7.4.3.
 
 **System:** {system_name}
-**FSRs to Allocate:** {len(fsrs)}
+**FSRs to Allocate:** {fsr_count}
 
 **Your Task:**
 For each FSR, determine the most appropriate component allocation based on:
@@ -96,41 +72,27 @@ For each FSR, determine the most appropriate component allocation based on:
 
 **Output Format:**
 
----
-## Allocation for FSR: [FSR-ID]
-**FSR:** [Brief description]
-**Type:** [Detection/Reaction/Indication]
-**ASIL:** [X]
-**Linked to SG:** [SG-ID]
-
-**Primary Allocation:** [Component Name]
-- **Component Type:** [Hardware/Software/External]
-- **Rationale:** [Why this component is appropriate]
-- **Interface:** [Key interfaces with other components]
-- **Supporting Components:** [Other components involved, if any]
-
-**Allocation Notes:**
-- [Any special considerations]
-- [Dependencies on other allocations]
+Return one JSON object per line, one line per FSR, and nothing else (no markdown, no fences):
+
+{{"fsr_id": "[FSR-ID]", "primary_component": "[Component Name]", "component_type": "[Hardware/Software/External]", "rationale": "[Why this component is appropriate]", "interface": "[Key interfaces with other components]"}}
 
 ---
 
 **FSRs to Allocate:**
 
 """
-    
-    for fsr in fsrs:
-        prompt += f"""
-### {fsr['id']}
-- **Description:** {fsr.get('description', 'N/A')}
-- **Type:** {fsr.get('type', 'Unknown')}
-- **ASIL:** {fsr.get('asil', 'QM')}
-- **Linked to SG:** {fsr.get('safety_goal_id', 'Unknown')}
-- **Preliminary Allocation:** {fsr.get('allocated_to', 'Not yet specified')}
+
+ALLOCATION_PROMPT_FSR_TEMPLATE = """
+### {id}
+- **Description:** {description}
+- **Type:** {type}
+- **ASIL:** {asil}
+- **Linked to SG:** {safety_goal_id}
+- **Preliminary Allocation:** {allocated_to}
 
 """
-    
-    prompt += """
+
+ALLOCATION_PROMPT_FOOTER = """
 **Requirements:**
 - Each FSR must have exactly ONE primary allocation
 - Provide clear rationale for each allocation
@@ -140,54 +102,134 @@ For each FSR, determine the most appropriate component allocation based on:
 
 **Now allocate all FSRs to appropriate system components.**
 """
+
+
+@tool(return_direct=True)
+def allocate_functional_requirements(tool_input, cat):
+    """
+    Allocate Functional Safety Requirements to system components.
+    
+    Performs preliminary allocation of FSRs to:
+    - Hardware components (sensors, actuators, ECUs)
+    - Software functions
+    - External systems (VCU, HMI, Gateway, etc.)
+    
+    Per ISO 26262-3:2018, Clause 7.4.3:
+    - Allocate FSRs to architectural elements
+    - Define interfaces between components
+    - Document allocation rationale
+    
+    Input: "allocate all FSRs" or "allocate FSR-XXX to [component]"
+    Example: "allocate all FSRs"
+    """
+    
+    print("✅ TOOL CALLED: allocate_functional_requirements")
+    
+    wm = cat.working_memory
+    
+    fsrs = wm.get("fsc_functional_requirements", [])
+    
+    if not fsrs:
+        return """❌ No FSRs available.
+
+**Required Steps:**
+1. Load HARA: `load HARA for [item name]`
+2. Develop strategy: `develop safety strategy for all goals`
+3. Derive FSRs: `derive FSRs for all goals`
+4. Allocate FSRs: `allocate all FSRs`
+"""
+    
+    input_str = str(tool_input).strip().lower()
+    
+    # Check if single FSR allocation
+    if ' to ' in input_str:
+        return allocate_single_fsr(tool_input, cat, fsrs)
+    
+    # Batch allocation for all FSRs
+    system_name = wm.get("system_name", "the system")
+    safety_goals = wm.get("fsc_safety_goals", [])
+    
+    # Manual allocations are the engineer's decision; only the other FSRs go to the LLM
+    fsrs_to_allocate = [f for f in fsrs if not f.get('allocation_manual')]
+    
+    log.info(f"🎯 Allocating {len(fsrs_to_allocate)} FSRs to system components "
+             f"({len(fsrs) - len(fsrs_to_allocate)} kept from manual allocation)")
+    
+    # Batch FSRs by descending ASIL; batches are allocated concurrently
+    batch_size = max(1, int(wm.get("fsc_batch_size", ALLOCATION_BATCH_SIZE)))
+    ordered_fsrs = sorted(fsrs_to_allocate, key=lambda f: ASIL_RANK.get(f.get('asil'), 0), reverse=True)
+    batches = pack_allocation_batches(ordered_fsrs, batch_size)
+    prompts = [build_allocation_prompt(blocks, system_name) for _, blocks in batches]
     
     try:
-        allocation_analysis = cat.llm(prompt).strip()
+        if prompts:
+            workers = min(ALLOCATION_LLM_WORKERS, len(prompts))
+            log.info(f"🤖 Allocating {len(batches)} batches of up to {batch_size} FSRs ({workers} in parallel)")
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                responses = list(executor.map(functools.partial(request_allocation, cat), prompts))
+        else:
+            log.info("♻️ All FSRs allocated manually - LLM call skipped")
+            responses = []
+        
+        # Parse allocations from each batch response (JSON lines, markdown as fallback)
+        allocations = {}
+        analysis_parts = []
+        for (batch, _), response in zip(batches, responses):
+            batch_allocations = parse_allocations_json(response, batch)
+            if batch_allocations is None:
+                batch_allocations = parse_allocations(response, batch)
+                analysis_parts.append(response)
+            else:
+                analysis_parts.append(render_allocations(batch, batch_allocations))
+            allocations.update(batch_allocations)
         
-        # Parse allocations from response
-        allocations = parse_allocations(allocation_analysis, fsrs)
+        if prompts:
+            allocation_analysis = "\n\n".join(part for part in analysis_parts if part)
+        else:
+            allocation_analysis = ALLOCATION_ALL_MANUAL_NOTE
         
         # Update FSRs with allocation information
-        for fsr in fsrs:
-            if fsr['id'] in allocations:
-                alloc = allocations[fsr['id']]
-                fsr['allocated_to'] = alloc['primary_component']
-                fsr['allocation_type'] = alloc['component_type']
-                fsr['allocation_rationale'] = alloc['rationale']
-                fsr['interface'] = alloc.get('interface', 'To be specified')
+        if allocations:
+            for fsr in fsrs:
+                if fsr['id'] in allocations:
+                    alloc = allocations[fsr['id']]
+                    fsr['allocated_to'] = alloc['primary_component']
+                    fsr['allocation_type'] = alloc['component_type']
+                    fsr['allocation_rationale'] = alloc['rationale']
+                    fsr['interface'] = alloc.get('interface', 'To be specified')
+        elif prompts:
+            log.warning("⚠️ No allocations could be parsed from the LLM response")
+            allocation_analysis = ALLOCATION_PARSE_FAILED_NOTE + allocation_analysis
         
         # Store updated FSRs
-        cat.working_memory["fsc_functional_requirements"] = fsrs
-        cat.working_memory["fsc_stage"] = "fsrs_allocated"
+        wm["fsc_functional_requirements"] = fsrs
+        wm["fsc_stage"] = "fsrs_allocated"
         
         # Generate summary
         allocated_count = len([f for f in fsrs if f.get('allocated_to')])
         
-        summary = f"""✅ **FSRs Allocated to System Components**
+        parts = [f"""✅ **FSRs Allocated to System Components**
 
 **System:** {system_name}
 **Total FSRs:** {len(fsrs)}
 **FSRs Allocated:** {allocated_count}
 
 **Allocation by Component Type:**
-"""
+"""]
         
-        component_types = {}
-        for fsr in fsrs:
-            comp_type = fsr.get('allocation_type', 'Unallocated')
-            component_types[comp_type] = component_types.get(comp_type, 0) + 1
+        component_types = Counter(fsr.get('allocation_type', 'Unallocated') for fsr in fsrs)
         
         for comp_type, count in sorted(component_types.items()):
-            summary += f"- {comp_type}: {count} FSRs\n"
+            parts.append(f"- {comp_type}: {count} FSRs\n")
         
-        summary += "\n**Allocation by ASIL:**\n"
+        parts.append("\n**Allocation by ASIL:**\n")
         
+        allocated_by_asil = Counter(f.get('asil') for f in fsrs if f.get('allocated_to'))
         for asil in ['D', 'C', 'B', 'A']:
-            asil_fsrs = [f for f in fsrs if f.get('asil') == asil and f.get('allocated_to')]
-            if asil_fsrs:
-                summary += f"- ASIL {asil}: {len(asil_fsrs)} FSRs allocated\n"
+            if allocated_by_asil[asil]:
+                parts.append(f"- ASIL {asil}: {allocated_by_asil[asil]} FSRs allocated\n")
         
-        summary += f"""
+        parts.append(f"""
 
 ---
 
@@ -212,17 +254,115 @@ For each FSR, determine the most appropriate component allocation based on:
    
 3. **Revise Allocation (if needed):**
    `allocate [FSR-ID] to [component name]`
-"""
+""")
         
-        return summary
+        return "".join(parts)
         
     except Exception as e:
         log.error(f"Error allocating FSRs: {e}")
-        import traceback
         log.error(traceback.format_exc())
         return f"❌ Error allocating FSRs: {str(e)}"
 
 
+def format_allocation_fsr_block(fsr):
+    """Render one FSR for the allocation prompt"""
+    return ALLOCATION_PROMPT_FSR_TEMPLATE.format(
+        id=fsr['id'],
+        description=fsr.get('description', 'N/A'),
+        type=fsr.get('type', 'Unknown'),
+        asil=fsr.get('asil', 'QM'),
+        safety_goal_id=fsr.get('safety_goal_id', 'Unknown'),
+        allocated_to=fsr.get('allocated_to', 'Not yet specified')
+    )
+
+
+def estimate_tokens(text):
+    """Rough token count for prompt budgeting (about 4 characters per token)"""
+    return (len(text) + 3) // 4
+
+
+def pack_allocation_batches(fsrs, batch_size):
+    """
+    Split FSRs into prompt batches of at most batch_size FSRs whose prompt
+    blocks stay within ALLOCATION_TOKEN_BUDGET. FSRs that don't fit start
+    the next batch; an FSR over the budget on its own gets a batch to itself.
+    
+    Returns:
+        list: (fsr batch, rendered prompt blocks) tuples
+    """
+    batches = []
+    batch, blocks, tokens = [], [], 0
+    
+    for fsr in fsrs:
+        block = format_allocation_fsr_block(fsr)
+        block_tokens = estimate_tokens(block)
+        if batch and (len(batch) == batch_size or tokens + block_tokens > ALLOCATION_TOKEN_BUDGET):
+            batches.append((batch, blocks))
+            batch, blocks, tokens = [], [], 0
+        batch.append(fsr)
+        blocks.append(block)
+        tokens += block_tokens
+    
+    if batch:
+        batches.append((batch, blocks))
+    return batches
+
+
+def build_allocation_prompt(fsr_blocks, system_name):
+    """
+    Build the allocation prompt for one batch of rendered FSR blocks.
+    """
+    
+    return "".join([
+        ALLOCATION_PROMPT_HEADER.format(system_name=system_name, fsr_count=len(fsr_blocks)),
+        *fsr_blocks,
+        ALLOCATION_PROMPT_FOOTER
+    ])
+
+
+def request_allocation(cat, prompt):
+    """
+    Ask the LLM to allocate one batch of FSRs.
+    Runs in a worker thread; a failed batch leaves its FSRs unallocated.
+    """
+    try:
+        return cat.llm(prompt).strip()
+    except Exception as e:
+        log.error(f"LLM call failed for allocation batch: {e}")
+        return ""
+
+
+def get_fsr_index(cat):
+    """
+    Return {fsr_id: fsr} for the derived FSRs.
+    Cached in working memory and rebuilt when the FSR list is re-derived,
+    replaced or changes size.
+    """
+    wm = cat.working_memory
+    fsrs = wm.get("fsc_functional_requirements", [])
+    index = wm.get("fsc_functional_requirements_by_id")
+    
+    if (index is None
+            or wm.get("fsc_functional_requirements_by_id_source") is not fsrs
+            or wm.get("fsc_functional_requirements_by_id_size") != len(fsrs)):
+        index = {f['id']: f for f in fsrs}
+        wm["fsc_functional_requirements_by_id"] = index
+        wm["fsc_functional_requirements_by_id_source"] = fsrs
+        wm["fsc_functional_requirements_by_id_size"] = len(fsrs)
+    
+    return index
+
+
+def component_type_from_name(component):
+    """
+    Classify a manually named component as Hardware, Software or External.
+    One scan collects every keyword category; the first category in
+    COMPONENT_TYPE_KEYWORDS order wins, Hardware is the default.
+    """
+    found = {match.lastgroup for match in COMPONENT_TYPE_RE.finditer(component.lower())}
+    return next((comp_type for comp_type in COMPONENT_TYPE_KEYWORDS if comp_type in found), 'Hardware')
+
+
 def allocate_single_fsr(tool_input, cat, fsrs):
     """
     Allocate a specific FSR to a component.
@@ -243,35 +383,28 @@ def allocate_single_fsr(tool_input, cat, fsrs):
     fsr_id_part = parts[0].replace('allocate', '').replace('fsr', '').strip().upper()
     component = parts[1].strip()
     
-    # Find FSR ID in the text
-    fsr_id = None
-    for fsr in fsrs:
-        if fsr['id'].upper() in fsr_id_part or fsr_id_part in fsr['id'].upper():
-            fsr_id = fsr['id']
-            break
+    # Find the FSR: exact ID lookup first, partial IDs ("SG-001-DET-1") by substring
+    fsrs_by_id = get_fsr_index(cat)
+    id_match = FSR_ID_RE.search(input_str.split(' to ', 1)[0].upper())
+    fsr = fsrs_by_id.get(id_match.group()) if id_match else None
+    if fsr is None:
+        fsr = next((f for f in fsrs
+                    if f['id'].upper() in fsr_id_part or fsr_id_part in f['id'].upper()), None)
     
-    if not fsr_id:
+    if not fsr:
         available = ', '.join(f['id'] for f in fsrs[:5])
         return f"❌ FSR not found in '{fsr_id_part}'. Available: {available}..."
     
-    # Find the FSR
-    fsr = next((f for f in fsrs if f['id'] == fsr_id), None)
+    fsr_id = fsr['id']
     
     # Determine component type
-    component_lower = component.lower()
-    if any(word in component_lower for word in ['hardware', 'sensor', 'actuator', 'ecu', 'module', 'circuit']):
-        comp_type = 'Hardware'
-    elif any(word in component_lower for word in ['software', 'algorithm', 'function', 'logic', 'routine']):
-        comp_type = 'Software'
-    elif any(word in component_lower for word in ['vcu', 'hmi', 'cluster', 'external', 'gateway']):
-        comp_type = 'External'
-    else:
-        comp_type = 'Hardware'  # Default
+    comp_type = component_type_from_name(component)
     
     # Update FSR
     fsr['allocated_to'] = component
     fsr['allocation_type'] = comp_type
     fsr['allocation_rationale'] = f"Manually allocated to {component}"
+    fsr['allocation_manual'] = True
     fsr['interface'] = 'To be specified in detailed design'
     
     return f"""✅ **FSR Allocated**
@@ -290,57 +423,144 @@ def allocate_single_fsr(tool_input, cat, fsrs):
 """
 
 
-def parse_allocations(llm_response, fsrs):
+# Allocation section header or field line, classified in one scan of the response:
+# "## Allocation for FSR: FSR-...", "**Primary Allocation:** ...", "- **Rationale:** ..."
+ALLOCATION_LINE_RE = re.compile(
+    r'^[ \t]*(?:## Allocation for FSR:(?P<header>.*)'
+    r'|(?:- )?\*\*(?P<label>Primary Allocation|Component Type|Rationale|Interface):\*\*(?P<value>.*))',
+    re.M
+)
+
+# FSR ID as generated by derive_functional_safety_requirements, e.g. "FSR-SG-001-DET-1"
+FSR_ID_RE = re.compile(r'\bFSR-[A-Za-z0-9-]*[A-Za-z0-9]')
+
+# Field label in the LLM response -> allocation key
+ALLOCATION_FIELD_KEYS = {
+    'Primary Allocation': 'primary_component',
+    'Component Type': 'component_type',
+    'Rationale': 'rationale',
+    'Interface': 'interface'
+}
+
+# Component name keywords per component type, in priority order
+COMPONENT_TYPE_KEYWORDS = {
+    'Hardware': ('hardware', 'sensor', 'actuator', 'ecu', 'module', 'circuit'),
+    'Software': ('software', 'algorithm', 'function', 'logic', 'routine'),
+    'External': ('vcu', 'hmi', 'cluster', 'external', 'gateway')
+}
+
+# Zero-width lookahead so overlapping keywords of different types are all seen
+COMPONENT_TYPE_RE = re.compile('(?=(?:' + '|'.join(
+    f"(?P<{comp_type}>{'|'.join(words)})" for comp_type, words in COMPONENT_TYPE_KEYWORDS.items()
+) + '))')
+
+# Detailed analysis when every FSR already carries a manual allocation
+ALLOCATION_ALL_MANUAL_NOTE = "All FSRs were allocated manually - no LLM allocation was needed."
+
+# Prepended to the detailed analysis when no allocation could be parsed
+ALLOCATION_PARSE_FAILED_NOTE = """⚠️ **No allocations could be read from the LLM response** - FSRs were left unchanged.
+Retry with `allocate all FSRs` or allocate individually with `allocate [FSR-ID] to [component]`.
+
+"""
+
+# One allocation as shown to the user
+ALLOCATION_SECTION_TEMPLATE = """## Allocation for FSR: {fsr_id}
+**FSR:** {description}
+**ASIL:** {asil}
+**Linked to SG:** {safety_goal_id}
+
+**Primary Allocation:** {primary_component}
+- **Component Type:** {component_type}
+- **Rationale:** {rationale}
+- **Interface:** {interface}
+"""
+
+
+def new_allocation(fsr_id):
+    """Create an empty allocation entry for an FSR"""
+    return {
+        'fsr_id': fsr_id,
+        'primary_component': '',
+        'component_type': 'Unknown',
+        'rationale': '',
+        'interface': ''
+    }
+
+
+def parse_allocations_json(llm_response, fsrs):
     """
-    Parse allocation information from LLM response.
-    Returns dict: {fsr_id: allocation_info}
+    Parse allocations from the JSON-lines LLM response, one object per FSR.
+    Returns dict: {fsr_id: allocation_info}, or None if no JSON line was found
+    so the caller can fall back to the markdown parser.
     """
     
     allocations = {}
-    current_fsr_id = None
-    current_allocation = {}
-    
-    lines = llm_response.split('\n')
+    fsr_ids = {fsr['id'] for fsr in fsrs}
     
-    for line in lines:
+    for line in llm_response.splitlines():
         line = line.strip()
+        if not line.startswith('{'):
+            continue
         
-        # Detect FSR section
-        if line.startswith('## Allocation for FSR:'):
-            # Save previous allocation
-            if current_fsr_id and current_allocation:
-                allocations[current_fsr_id] = current_allocation
-            
-            # Start new allocation
-            for fsr in fsrs:
-                if fsr['id'] in line:
-                    current_fsr_id = fsr['id']
-                    current_allocation = {
-                        'fsr_id': fsr['id'],
-                        'primary_component': '',
-                        'component_type': 'Unknown',
-                        'rationale': '',
-                        'interface': ''
-                    }
-                    break
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            log.warning(f"⚠️ Skipping invalid allocation JSON line: {e}")
+            continue
+        
+        fsr_id = str(item.get('fsr_id', '')).strip() if isinstance(item, dict) else ''
+        if fsr_id not in fsr_ids:
+            continue
+        
+        allocation = new_allocation(fsr_id)
+        for field in ALLOCATION_FIELD_KEYS.values():
+            if item.get(field):
+                allocation[field] = str(item[field]).strip()
+        allocations[fsr_id] = allocation
+    
+    if not allocations:
+        return None
+    
+    log.info(f"✅ Parsed {len(allocations)} allocations from JSON lines")
+    return allocations
+
+
+def render_allocations(fsrs, allocations):
+    """Render parsed allocations as the markdown shown in the allocation summary"""
+    return "\n---\n".join(
+        ALLOCATION_SECTION_TEMPLATE.format(
+            fsr_id=fsr['id'],
+            description=fsr.get('description', 'N/A'),
+            asil=fsr.get('asil', 'QM'),
+            safety_goal_id=fsr.get('safety_goal_id', 'Unknown'),
+            **{field: allocations[fsr['id']][field] for field in ALLOCATION_FIELD_KEYS.values()}
+        )
+        for fsr in fsrs if fsr['id'] in allocations
+    )
+
+
+def parse_allocations(llm_response, fsrs):
+    """
+    Parse allocation information from a markdown LLM response.
+    Fallback for answers that ignore the JSON-lines format.
+    Returns dict: {fsr_id: allocation_info}
+    """
+    
+    allocations = {}
+    current_allocation = None
+    fsr_ids = {fsr['id'] for fsr in fsrs}
+    
+    for match in ALLOCATION_LINE_RE.finditer(llm_response):
+        # Detect FSR section; the exact ID is looked up, so FSR-...-1 never claims FSR-...-10
+        if match.lastgroup == 'header':
+            id_match = FSR_ID_RE.search(match.group('header'))
+            if id_match and id_match.group() in fsr_ids:
+                current_allocation = new_allocation(id_match.group())
+                allocations[id_match.group()] = current_allocation
         
         # Parse allocation fields
-        if current_fsr_id:
-            if line.startswith('**Primary Allocation:**'):
-                current_allocation['primary_component'] = line.replace('**Primary Allocation:**', '').strip()
-            elif line.startswith('- **Component Type:**'):
-                comp_type = line.replace('- **Component Type:**', '').strip()
-                current_allocation['component_type'] = comp_type
-            elif line.startswith('- **Rationale:**'):
-                rationale = line.replace('- **Rationale:**', '').strip()
-                current_allocation['rationale'] = rationale
-            elif line.startswith('- **Interface:**'):
-                interface = line.replace('- **Interface:**', '').strip()
-                current_allocation['interface'] = interface
-    
-    # Save last allocation
-    if current_fsr_id and current_allocation:
-        allocations[current_fsr_id] = current_allocation
+        elif current_allocation:
+            current_allocation[ALLOCATION_FIELD_KEYS[match.group('label')]] = match.group('value').strip()
     
     log.info(f"✅ Parsed {len(allocations)} allocations from LLM response")
     return allocations
@@ -359,7 +579,8 @@ def show_allocation_summary(tool_input, cat):
     Input: "show allocation summary"
     """
     
-    fsrs = cat.working_memory.get("fsc_functional_requirements", [])
+    wm = cat.working_memory
+    fsrs = wm.get("fsc_functional_requirements", [])
     
     if not fsrs:
         return "❌ No FSRs available."
@@ -372,12 +593,9 @@ def show_allocation_summary(tool_input, cat):
     # Group by component
     by_component = {}
     for fsr in allocated_fsrs:
-        component = fsr.get('allocated_to', 'Unallocated')
-        if component not in by_component:
-            by_component[component] = []
-        by_component[component].append(fsr)
+        by_component.setdefault(fsr['allocated_to'], []).append(fsr)
     
-    summary = f"""📊 **FSR Allocation Summary**
+    parts = [f"""📊 **FSR Allocation Summary**
 
 **Total FSRs:** {len(fsrs)}
 **Allocated:** {len(allocated_fsrs)}
@@ -387,24 +605,26 @@ def show_allocation_summary(tool_input, cat):
 
 **Allocation by Component:**
 
-"""
+"""]
     
     for component, comp_fsrs in sorted(by_component.items()):
         comp_type = comp_fsrs[0].get('allocation_type', 'Unknown')
-        asil_levels = list(set(f.get('asil', 'QM') for f in comp_fsrs))
+        # Most critical first; a plain reverse string sort would put QM before D
+        asil_levels = sorted({f.get('asil', 'QM') for f in comp_fsrs},
+                             key=lambda asil: ASIL_RANK.get(asil, 0), reverse=True)
         
-        summary += f"\n### {component} ({comp_type})\n"
-        summary += f"- **FSRs:** {len(comp_fsrs)}\n"
-        summary += f"- **ASIL Levels:** {', '.join(sorted(asil_levels, reverse=True))}\n"
-        summary += f"- **Requirements:**\n"
+        parts.append(f"\n### {component} ({comp_type})\n")
+        parts.append(f"- **FSRs:** {len(comp_fsrs)}\n")
+        parts.append(f"- **ASIL Levels:** {', '.join(asil_levels)}\n")
+        parts.append(f"- **Requirements:**\n")
         
         for fsr in comp_fsrs[:5]:  # Show first 5
-            summary += f"  - {fsr['id']}: {fsr.get('type', 'Unknown')}\n"
+            parts.append(f"  - {fsr['id']}: {fsr.get('type', 'Unknown')}\n")
         
         if len(comp_fsrs) > 5:
-            summary += f"  - ... and {len(comp_fsrs) - 5} more\n"
+            parts.append(f"  - ... and {len(comp_fsrs) - 5} more\n")
     
-    return summary
+    return "".join(parts)
 
 
 # COMMENTED OUT: Features not needed for current implementation
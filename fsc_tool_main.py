@@ -4,27 +4,29 @@
 
 from cat.mad_hatter.decorators import tool
 from cat.log import log
-from datetime import datetime
+from collections import ChainMap, Counter
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import hashlib
 import os
 import json
+import re
+import traceback
+
+from .llm_cache import (
+    embed_text,
+    prompt_cache_lookup,
+    prompt_cache_store,
+    semantic_cache_lookup,
+    semantic_cache_store
+)
 
 
-@tool(
-    return_direct=True,
-    examples=[
-        "step to generate fsc",
-        "show fs workflow",
-        "what do i need to do to generate fsc?",
-    ]
-)
-def show_fsc_workflow(tool_input, cat):
-    """
-    Display the FSC development workflow per ISO 26262-3:2018, Clause 7.
-    
-    Input: "show FSC workflow" or "help with FSC"
-    """
-    
-    workflow = """
+# ============================================================================
+# STATIC MESSAGES
+# ============================================================================
+
+FSC_WORKFLOW = """
 📋 **Functional Safety Concept (FSC) Development Workflow**
 *ISO 26262-3:2018, Clause 7*
 
@@ -92,8 +94,111 @@ e) Verify FSC and specify safety validation criteria
 5. `specify validation criteria`
 6. `generate FSC document`
 """
+
+HARA_NOT_FOUND_MSG = """❌ **No HARA found for '{item_name}'**
+
+**ISO 26262-3:2018, 7.3.1 Prerequisites:**
+The following information shall be available:
+- Item definition (ISO 26262-3, Clause 5)
+- HARA report (ISO 26262-3, Clause 6)
+- System architectural design
+
+**Please ensure:**
+1. HARA has been generated using the HARA Assistant plugin
+2. The item name matches exactly
+3. The HARA is available in one of these locations:
+   - Working memory (if just generated)
+   - `hara_inputs/` folder in FSC plugin
+   - Generated documents from HARA plugin
+
+**Alternative:**
+You can manually place your HARA file in:
+- Excel format: `plugins/AI_Agent-FSC_Developer/hara_inputs/[item_name]_HARA.xlsx`
+
+**Supported HARA Columns:**
+- Safety Goal
+- ASIL (A/B/C/D)
+- Safe State
+- FTTI (Fault Tolerant Time Interval)
+- Hazard ID, Severity (S), Exposure (E), Controllability (C)
+"""
+
+HARA_NO_GOALS_MSG = """❌ **No valid safety goals found in HARA for '{item_name}'**
+
+**ISO 26262-3:2018, 7.4.2.2 Requirement:**
+At least one functional safety requirement shall be derived from each safety goal.
+
+**Common issues:**
+- HARA table missing safety goal column
+- All safety goals are QM (no ASIL A/B/C/D)
+- File format not recognized
+
+**Please check:**
+1. HARA file contains safety goals with ASIL ratings
+2. At least one safety goal has ASIL A, B, C, or D
+3. File is in supported format (Excel .xlsx or working memory)
+"""
+
+# Workflow progress lines shared by the tool summaries
+FSC_DONE_HARA = "- ✅ Step 1: Safety Goals extracted from HARA\n"
+FSC_DONE_STRATEGY = "- ✅ Step 2: Safe Strategies developed for each Safety Goal (Clause 7.4.2.3)\n"
+FSC_DONE_FSR = "- ✅ Step 3: Functional Safety Requirements derived for each Safety Goal\n"
+
+FSC_NEXT_STEPS_HEADING = "   \n**Next Steps per ISO 26262-3:2018 - Functional Safety Concept Development**\n\n"
+FSC_NEXT_STRATEGY = "➡️ Step 2: Develop Safety Strategy (Clause 7.4.2.3): `develop safety strategy for all safety goals` \n\n"
+FSC_NEXT_FSR = "➡️ Step 3: Derive Functional Safety Requirements (Clause 7.4.2.1): `derive FSRs for all goals`\n\n"
+FSC_NEXT_AFTER_FSR = """➡️ Step 4: Allocate Functional Safety Requirements to system architecture components: `Allocate FSRs to system architecture`
+
+➡️ Step 4: Specify Validation Criteria with system architecture.
+
+➡️ Step 5: Generate Functional Safety Concept work product.
+
+"""
+
+HARA_SUMMARY_HEADER = """✅ **HARA Loaded Successfully** (*ISO 26262-3:2018, 7.3.1: Prerequisites satisfied*)
+
+**System:** {item_name}
+**Safety Goals Extracted:** {goal_count}
+
+**ASIL Distribution:**
+"""
+
+HARA_SUMMARY_GOAL = """**{id}** (ASIL {asil})
+- Goal: {description}
+- Safe State: {safe_state}
+
+"""
+
+# Shown for fields missing from a safety goal
+HARA_SUMMARY_GOAL_DEFAULTS = {
+    'id': 'Unknown',
+    'description': 'N/A',
+    'asil': 'QM',
+    'safe_state': 'Not specified'
+}
+
+HARA_SUMMARY_FOOTER = (
+    "---\n\n**Completed:**\n" + FSC_DONE_HARA
+    + FSC_NEXT_STEPS_HEADING + FSC_NEXT_STRATEGY + FSC_NEXT_FSR + FSC_NEXT_AFTER_FSR
+)
+
+
+@tool(
+    return_direct=True,
+    examples=[
+        "step to generate fsc",
+        "show fs workflow",
+        "what do i need to do to generate fsc?",
+    ]
+)
+def show_fsc_workflow(tool_input, cat):
+    """
+    Display the FSC development workflow per ISO 26262-3:2018, Clause 7.
+    
+    Input: "show FSC workflow" or "help with FSC"
+    """
     
-    return workflow
+    return FSC_WORKFLOW
 
 
 @tool(
@@ -132,12 +237,14 @@ def load_hara_for_fsc(tool_input, cat):
     
     print("✅ TOOL CALLED: load_hara_for_fsc")
     
+    wm = cat.working_memory
+    
     # Parse input
     item_name = "Unknown System"
     if isinstance(tool_input, str):
         item_name = tool_input.strip()
         if item_name.lower() in ["use current hara", "use current", "current"]:
-            item_name = cat.working_memory.get("system_name", item_name)
+            item_name = wm.get("system_name", item_name)
     elif isinstance(tool_input, dict):
         item_name = tool_input.get("item_name", item_name)
     
@@ -147,112 +254,118 @@ def load_hara_for_fsc(tool_input, cat):
     hara_data = find_hara_data(cat, item_name)
     
     if not hara_data:
-        return f"""❌ **No HARA found for '{item_name}'**
-
-**ISO 26262-3:2018, 7.3.1 Prerequisites:**
-The following information shall be available:
-- Item definition (ISO 26262-3, Clause 5)
-- HARA report (ISO 26262-3, Clause 6)
-- System architectural design
-
-**Please ensure:**
-1. HARA has been generated using the HARA Assistant plugin
-2. The item name matches exactly
-3. The HARA is available in one of these locations:
-   - Working memory (if just generated)
-   - `hara_inputs/` folder in FSC plugin
-   - Generated documents from HARA plugin
-
-**Alternative:**
-You can manually place your HARA file in:
-- Excel format: `plugins/AI_Agent-FSC_Developer/hara_inputs/[item_name]_HARA.xlsx`
-
-**Supported HARA Columns:**
-- Safety Goal
-- ASIL (A/B/C/D)
-- Safe State
-- FTTI (Fault Tolerant Time Interval)
-- Hazard ID, Severity (S), Exposure (E), Controllability (C)
-"""
+        return HARA_NOT_FOUND_MSG.format(item_name=item_name)
     
     # Parse and validate HARA data
     safety_goals = parse_safety_goals(hara_data)
     
     if not safety_goals:
-        return f"""❌ **No valid safety goals found in HARA for '{item_name}'**
-
-**ISO 26262-3:2018, 7.4.2.2 Requirement:**
-At least one functional safety requirement shall be derived from each safety goal.
-
-**Common issues:**
-- HARA table missing safety goal column
-- All safety goals are QM (no ASIL A/B/C/D)
-- File format not recognized
-
-**Please check:**
-1. HARA file contains safety goals with ASIL ratings
-2. At least one safety goal has ASIL A, B, C, or D
-3. File is in supported format (Excel .xlsx or working memory)
-"""
+        return HARA_NO_GOALS_MSG.format(item_name=item_name)
     
     # Store in working memory
-    cat.working_memory["system_name"] = item_name
-    cat.working_memory["fsc_safety_goals"] = safety_goals
-    cat.working_memory["fsc_stage"] = "hara_loaded"
+    wm["system_name"] = item_name
+    wm["fsc_safety_goals"] = safety_goals
+    wm["fsc_stage"] = "hara_loaded"
+    
+    # Build the goal ID index and "Available:" hint once per load,
+    # so single-goal commands don't rescan the list
+    wm["fsc_safety_goals_index"] = None
+    get_goal_hint(cat)
     
     # Generate summary
-    summary = f"""✅ **HARA Loaded Successfully** (*ISO 26262-3:2018, 7.3.1: Prerequisites satisfied*)
-
-**System:** {item_name}
-**Safety Goals Extracted:** {len(safety_goals)}
-
-**ASIL Distribution:**
-"""
+    parts = [HARA_SUMMARY_HEADER.format(item_name=item_name, goal_count=len(safety_goals))]
     
-    asil_counts = {}
-    for sg in safety_goals:
-        asil = sg.get('asil', 'QM')
-        asil_counts[asil] = asil_counts.get(asil, 0) + 1
+    asil_counts = Counter(sg.get('asil', 'QM') for sg in safety_goals)
     
     for asil in ['D', 'C', 'B', 'A', 'QM']:
         if asil in asil_counts:
-            summary += f"- ASIL {asil}: {asil_counts[asil]} goals\n"
+            parts.append(f"- ASIL {asil}: {asil_counts[asil]} goals\n")
     
-    summary += "\n**Safety Goals Overview:**\n\n"
+    parts.append("\n**Safety Goals Overview:**\n\n")
     
     for sg in safety_goals[:10]:  # Show first 10
-        sg_id = sg.get('id', 'Unknown')
-        sg_desc = sg.get('description', 'N/A')
-        sg_asil = sg.get('asil', 'QM')
-        sg_safe_state = sg.get('safe_state', 'Not specified')
-        
-        summary += f"**{sg_id}** (ASIL {sg_asil})\n"
-        summary += f"- Goal: {sg_desc}\n"
-        summary += f"- Safe State: {sg_safe_state}\n\n"
+        parts.append(HARA_SUMMARY_GOAL.format_map(ChainMap(sg, HARA_SUMMARY_GOAL_DEFAULTS)))
     
     if len(safety_goals) > 10:
-        summary += f"... and {len(safety_goals) - 10} more safety goals\n\n"
+        parts.append(f"... and {len(safety_goals) - 10} more safety goals\n\n")
+    
+    parts.append(HARA_SUMMARY_FOOTER)
     
-    summary += """---
+    return "".join(parts)
+
+
+# ============================================================================
+# SAFETY STRATEGY TEMPLATES
+# ============================================================================
 
-**Completed:**
-- ✅ Step 1: Safety Goals extracted from HARA
-   
-**Next Steps per ISO 26262-3:2018 - Functional Safety Concept Development**
+STRATEGY_NO_GOALS_MSG = """❌ No safety goals loaded.
 
-➡️ Step 2: Develop Safety Strategy (Clause 7.4.2.3): `develop safety strategy for all safety goals` 
+**Required Steps per ISO 26262-3:2018:**
+1. Load HARA (7.3.1): `load HARA for [item name]`
+2. Then develop strategy (7.4.2.3): `develop safety strategy for all safety goals`
+"""
 
-➡️ Step 3: Derive Functional Safety Requirements (Clause 7.4.2.1): `derive FSRs for all goals`
+STRATEGY_QM_NARRATIVE = """## Safety Strategy for {sg_id}: QM - no safety strategy required
 
-➡️ Step 4: Allocate Functional Safety Requirements to system architecture components: `Allocate FSRs to system architecture`
+This goal is rated QM and is addressed by the quality management system. The strategies of ISO 26262-3:2018, 7.4.2.3 apply to ASIL A-D safety goals."""
 
-➡️ Step 4: Specify Validation Criteria with system architecture.
+STRATEGY_PROMPT_TEMPLATE = """You are a senior Functional Safety Engineer developing strategies per ISO 26262-3:2018, Clause 7.4.2.3.
 
-➡️ Step 5: Generate Functional Safety Concept work product.
+**System:** {system_name}
+**Safety Goal:** {sg_id}
+- Description: "{description}"
+- ASIL: {asil}
+- Safe State: "{safe_state}"
+- FTTI: {ftti} ms
+- Hazard Profile: S{severity}/E{exposure}/C{controllability}
+
+Write a **concise safety strategy in 1-2 paragraphs (2–3 lines** (max 3 sentences) for inclusion in section 5.1.1 of the FSC.  
+Focus on:  
+- The main hazard or malfunction being addressed,  
+- The key technical or architectural measure(s) to prevent/contain it,  
+- How the safe state is achieved or maintained,  
+- And, if relevant, the role of driver warnings or degraded modes.
+
+Avoid bullet points, lists, or section headers. Write in fluent, professional prose.
+
+Example style:  
+"The strategy ensures front wiper activation via driver input or rain sensor, with fallback to minimum continuous wiping if critical faults (e.g., NBC or WSM failure) are detected. A driver warning is issued to maintain controllability, ensuring the safe state is reached within the FTTI."
+Your narrative must naturally cover:
+- The hazard scenario and why this safety goal exists.
+- How faults are avoided through design, process, or architecture.
+- How faults or malfunctions are detected and controlled at runtime.
+- How the system transitions to the defined safe state within the FTTI.
+- Whether fault tolerance (e.g., redundancy) is used.
+- How functionality degrades (e.g., limp-home) while preserving safety.
+- What driver warnings are provided to reduce exposure time and improve controllability.
+- How the total fault handling time (detection + reaction) fits within the FTTI.
+- If applicable, how conflicting control requests are arbitrated.
+- Assumed driver actions and available means of control.
+- Behavior in normal, degraded, and emergency operating modes.
+
+Write as if briefing a safety assessor: clear, technically precise, and traceable to ISO 26262.
+
+Begin your response with:
+## Safety Strategy for {sg_id}: {description_short}...
+
+Now write the strategy and continue with the narrative:
+"""
+
+STRATEGY_SUMMARY_HEADER = """✅ **Functional Safety Strategies Developed**
+*Compliant with ISO 26262-3:2018, Clause 7.4.2.3*
 
+**System:** {system_name}
+**Safety Strategies Generated:** {strategy_count}
+
+**Coverage by ASIL:**
 """
-    
-    return summary
+
+STRATEGY_SUMMARY_SEPARATOR = "\n\n---\n\n"
+
+STRATEGY_SUMMARY_FOOTER = (
+    "\n\n---\n**Completed:**\n" + FSC_DONE_HARA + FSC_DONE_STRATEGY
+    + FSC_NEXT_STEPS_HEADING + FSC_NEXT_FSR + FSC_NEXT_AFTER_FSR
+)
 
 
 @tool(
@@ -284,27 +397,18 @@ def develop_safety_strategy(tool_input, cat):
     
     print("✅ TOOL CALLED: develop_safety_strategy")
     
-    safety_goals = cat.working_memory.get("fsc_safety_goals", [])
+    wm = cat.working_memory
+    
+    safety_goals = wm.get("fsc_safety_goals", [])
     
     if not safety_goals:
-        return """❌ No safety goals loaded.
-
-**Required Steps per ISO 26262-3:2018:**
-1. Load HARA (7.3.1): `load HARA for [item name]`
-2. Then develop strategy (7.4.2.3): `develop safety strategy for all safety goals`
-"""
+        return STRATEGY_NO_GOALS_MSG
     
-    system_name = cat.working_memory.get("system_name", "the system")
+    system_name = wm.get("system_name", "the system")
     input_str = str(tool_input).strip().lower()
 
     # ✅ FIXED: Single, clean logic to decide "all" vs "single"
-    if (
-        "all" in input_str or
-        input_str == "" or
-        "safety goals" in input_str or
-        "all goals" in input_str or
-        "for all" in input_str
-    ):
+    if means_all_goals(input_str):
         goals_to_process = safety_goals
         log.info(f"🎯 Developing safety strategy for {len(goals_to_process)} safety goals")
     else:
@@ -314,17 +418,32 @@ def develop_safety_strategy(tool_input, cat):
             # Normalize: remove non-alphanumeric, ensure SG- prefix
             clean_part = ''.join(filter(str.isalnum, sg_id.replace('SG', '')))
             sg_id = f"SG-{clean_part}"
-        goals_to_process = [sg for sg in safety_goals if sg['id'] == sg_id]
+        sg = get_goal_index(cat).get(sg_id)
+        goals_to_process = [sg] if sg else []
         
         if not goals_to_process:
-            return f"❌ Safety Goal '{sg_id}' not found."
+            return f"❌ Safety Goal '{sg_id}' not found. Available: {get_goal_hint(cat)}..."
 
     # Generate narrative strategy for each goal individually
     strategy_narratives = []
     parsed_strategies = []
 
+    strategy_cache = wm.get("fsc_strategy_cache")
+    if strategy_cache is None:
+        strategy_cache = wm["fsc_strategy_cache"] = {}
+
+    # Pass 1: build each goal's prompt and reuse unchanged narratives
+    responses = {}
+    pending = []
     for sg in goals_to_process:
         sg_id = sg['id']
+
+        # QM goals are covered by quality management, not by a safety strategy
+        if sg.get('asil', 'QM') == 'QM':
+            log.debug(f"⏭️ {sg_id} is QM - no safety strategy required, LLM call skipped")
+            responses[sg_id] = STRATEGY_QM_NARRATIVE.format(sg_id=sg_id)
+            continue
+
         description = sg['description']
         asil = sg['asil']
         safe_state = sg.get('safe_state', 'To be defined per ISO 26262-3:2018, 7.4.2.5')
@@ -333,121 +452,223 @@ def develop_safety_strategy(tool_input, cat):
         exposure = sg.get('exposure', '?')
         controllability = sg.get('controllability', '?')
 
-        prompt = f"""You are a senior Functional Safety Engineer developing strategies per ISO 26262-3:2018, Clause 7.4.2.3.
+        prompt = STRATEGY_PROMPT_TEMPLATE.format(
+            system_name=system_name,
+            sg_id=sg_id,
+            description=description,
+            description_short=description[:60],
+            asil=asil,
+            safe_state=safe_state,
+            ftti=ftti,
+            severity=severity,
+            exposure=exposure,
+            controllability=controllability
+        )
+
+        # Identical resubmissions (e.g. chat UI retries) reuse this session's narrative
+        cache_key = hashlib.blake2b(prompt.encode(), digest_size=16).hexdigest()
+
+        if cache_key in strategy_cache:
+            log.debug(f"♻️ Reusing safety strategy for {sg_id} - inputs unchanged")
+            responses[sg_id] = strategy_cache[cache_key]
+            continue
+
+        # Narratives from earlier sessions with the same inputs
+        stored = prompt_cache_lookup("safety_strategy", prompt)
+        if stored is not None:
+            responses[sg_id] = strategy_cache[cache_key] = stored
+        else:
+            pending.append((sg_id, prompt, cache_key))
+
+    log.info(f"♻️ Safety strategies: {len(goals_to_process) - len(pending)} reused or QM, {len(pending)} to generate")
+
+    # Pass 2: the LLM round-trips are independent, so run them concurrently
+    if pending:
+        log.info(f"🤖 Generating {len(pending)} safety strategies ({min(STRATEGY_LLM_WORKERS, len(pending))} in parallel)")
+        with ThreadPoolExecutor(max_workers=min(STRATEGY_LLM_WORKERS, len(pending))) as executor:
+            results = executor.map(lambda item: generate_safety_strategy(cat, item[0], item[1]), pending)
+            for (sg_id, prompt, cache_key), (response, ok) in zip(pending, results):
+                responses[sg_id] = response
+                if ok:
+                    strategy_cache[cache_key] = response
+                    prompt_cache_store("safety_strategy", prompt, response)
+
+    # Pass 3: collect narratives in safety goal order
+    for sg in goals_to_process:
+        sg_id = sg['id']
+        asil = sg['asil']
+        safe_state = sg.get('safe_state', 'To be defined per ISO 26262-3:2018, 7.4.2.5')
+        ftti = sg.get('ftti', 'TBD')
+        response = responses[sg_id]
 
-**System:** {system_name}
-**Safety Goal:** {sg_id}
-- Description: "{description}"
-- ASIL: {asil}
-- Safe State: "{safe_state}"
-- FTTI: {ftti} ms
-- Hazard Profile: S{severity}/E{exposure}/C{controllability}
+        strategy_narratives.append(response)
 
-Write a **concise safety strategy in 1-2 paragraphs (2–3 lines** (max 3 sentences) for inclusion in section 5.1.1 of the FSC.  
-Focus on:  
-- The main hazard or malfunction being addressed,  
-- The key technical or architectural measure(s) to prevent/contain it,  
-- How the safe state is achieved or maintained,  
-- And, if relevant, the role of driver warnings or degraded modes.
+        # Strategy reference on the goal itself (same string object, not a copy)
+        sg['strategy_narrative'] = response
 
-Avoid bullet points, lists, or section headers. Write in fluent, professional prose.
+        # Store structured version for traceability (minimal)
+        parsed_strategies.append({
+            "safety_goal_id": sg_id,
+            "asil": asil,
+            "narrative": response,
+            "ftti": ftti,
+            "safe_state": safe_state
+        })
 
-Example style:  
-"The strategy ensures front wiper activation via driver input or rain sensor, with fallback to minimum continuous wiping if critical faults (e.g., NBC or WSM failure) are detected. A driver warning is issued to maintain controllability, ensuring the safe state is reached within the FTTI."
-Your narrative must naturally cover:
-- The hazard scenario and why this safety goal exists.
-- How faults are avoided through design, process, or architecture.
-- How faults or malfunctions are detected and controlled at runtime.
-- How the system transitions to the defined safe state within the FTTI.
-- Whether fault tolerance (e.g., redundancy) is used.
-- How functionality degrades (e.g., limp-home) while preserving safety.
-- What driver warnings are provided to reduce exposure time and improve controllability.
-- How the total fault handling time (detection + reaction) fits within the FTTI.
-- If applicable, how conflicting control requests are arbitrated.
-- Assumed driver actions and available means of control.
-- Behavior in normal, degraded, and emergency operating modes.
+    # Save to working memory
+    wm["fsc_safety_strategies"] = parsed_strategies
+    wm["fsc_stage"] = "strategies_developed"
 
-Write as if briefing a safety assessor: clear, technically precise, and traceable to ISO 26262.
+    # Build final output
+    full_text = "\n\n".join(strategy_narratives)
+    
+    # Summary stats
+    asil_counts = Counter(s['asil'] for s in parsed_strategies)
 
-Begin your response with:
-## Safety Strategy for {sg_id}: {description[:60]}...
+    parts = [STRATEGY_SUMMARY_HEADER.format(system_name=system_name, strategy_count=len(parsed_strategies))]
+    for asil in ['D', 'C', 'B', 'A']:
+        if asil in asil_counts:
+            parts.append(f"- ASIL {asil}: {asil_counts[asil]} strategies\n")
 
-Now write the strategy and continue with the narrative:
-"""
+    # Narratives are copied once, into the joined result
+    parts.append(STRATEGY_SUMMARY_SEPARATOR)
+    parts.append(full_text)
+    parts.append(STRATEGY_SUMMARY_FOOTER)
 
-        try:
-            response = cat.llm(prompt).strip()
-            if not response or "error" in response.lower():
-                response = f"## Safety Strategy for {sg_id}: [Generation failed – manual review required]\n\nStrategy could not be generated automatically. Requires expert input per ISO 26262."
-        except Exception as e:
-            log.error(f"LLM call failed for {sg_id}: {e}")
-            response = f"## Safety Strategy for {sg_id}: [Error]\n\nFailed to generate: {str(e)}"
+    return "".join(parts)
 
-        strategy_narratives.append(response)
 
-        # Store structured version for traceability (minimal)
-        parsed_strategies.append({
-            "safety_goal_id": sg_id,
-            "asil": asil,
-            "narrative": response,
-            "ftti": ftti,
-            "safe_state": safe_state
-        })
+# ============================================================================
+# FSR DERIVATION TEMPLATES
+# ============================================================================
 
-    # Save to working memory
-    cat.working_memory["fsc_safety_strategies"] = parsed_strategies
-    cat.working_memory["fsc_stage"] = "strategies_developed"
+FSR_NO_GOALS_MSG = """❌ No safety goals loaded.
 
-    # Update original safety goals with strategy references
-    for sg in safety_goals:
-        matching = [s for s in parsed_strategies if s['safety_goal_id'] == sg['id']]
-        if matching:
-            sg['strategy_narrative'] = matching[0]['narrative']
+**Required Steps per ISO 26262-3:2018:**
+1. Load HARA (7.3.1): `load HARA for [item name]`
+2. Develop strategy (7.4.2.3): `develop safety strategy for all safety goals`
+3. Derive FSRs (7.4.2.1): `derive FSRs for all goals`
+"""
 
-    # Build final output
-    full_text = "\n\n".join(strategy_narratives)
-    
-    # Summary stats
-    asil_counts = {}
-    for s in parsed_strategies:
-        asil_counts[s['asil']] = asil_counts.get(s['asil'], 0) + 1
+FSR_QM_SECTION = """## FSRs for Safety Goal: {sg_id}
 
-    summary = f"""✅ **Functional Safety Strategies Developed**
-*Compliant with ISO 26262-3:2018, Clause 7.4.2.3*
+Rated QM: addressed by the quality management system, no functional safety requirements derived."""
+
+FSR_PROMPT_HEADER = """You are deriving Functional Safety Requirements (FSRs) per ISO 26262-3:2018, Clause 7.4.2.
 
 **System:** {system_name}
-**Safety Strategies Generated:** {len(parsed_strategies)}
+**Safety Goals to Process:** {goal_count}
 
-**Coverage by ASIL:**
-"""
-    for asil in ['D', 'C', 'B', 'A']:
-        if asil in asil_counts:
-            summary += f"- ASIL {asil}: {asil_counts[asil]} strategies\n"
+**ISO 26262-3:2018 Requirements:**
+
+**7.4.2.1:** FSRs shall be derived from safety goals, considering system architectural design
+**7.4.2.2:** At least one FSR shall be derived from each safety goal
+**7.4.2.4:** Each FSR shall be specified by considering, as applicable:
+   a) Operating modes
+   b) Fault tolerant time interval (FTTI)
+   c) Safe states
+   d) Emergency operation time interval
+   e) Functional redundancies
 
-    summary += f"""
+**7.4.1:** FSRs shall be specified per ISO 26262-8:2018, Clause 6 (requirements specification)
 
----
+**Your Task:**
+For each safety goal, derive measurable, verifiable Functional Safety Requirements that implement the strategies.
+
+**FSR Categories (based on strategies from 7.4.2.3):**
 
-{full_text}
+1. **Fault Avoidance Requirements** (AVD)
+2. **Fault Detection Requirements** (DET)
+3. **Fault Control Requirements** (CTL)
+4. **Safe State Transition Requirements** (SST)
+5. **Fault Tolerance Requirements** (TOL)
+6. **Warning/Indication Requirements** (WRN)
+7. **Timing Requirements** (TIM)
+8. **Arbitration Requirements** (ARB, if applicable)
+
+**FSR Quality Criteria per ISO 26262-8:2018, Clause 6:**
+- Measurable, Verifiable, Traceable, Unambiguous, Complete, Consistent, Feasible
+
+**Output Format:**
+
+Output only a JSON object (no markdown, no fences, no comments) mapping each safety goal ID
+to its FSRs. Give each FSR the category code it belongs to; FSR IDs, ASIL and safety goal
+linkage are assigned automatically, do not include them.
+
+{{"[SG-ID]": [{{"category": "DET", "description": "...", "operating_modes": "...",
+  "allocated_to": "...", "verification_criteria": "..."}}]}}
 
 ---
-**Completed:**
-- ✅ Step 1: Safety Goals extracted from HARA
-- ✅ Step 2: Safe Strategies developed for each Safety Goal (Clause 7.4.2.3)
-   
-**Next Steps per ISO 26262-3:2018 - Functional Safety Concept Development**
 
-➡️ Step 3: Derive Functional Safety Requirements (Clause 7.4.2.1): `derive FSRs for all goals`
+**Safety Goals and Strategies:**
 
-➡️ Step 4: Allocate Functional Safety Requirements to system architecture components: `Allocate FSRs to system architecture`
+"""
 
-➡️ Step 4: Specify Validation Criteria with system architecture.
+FSR_PROMPT_GOAL_TEMPLATE = """
+### {id}
+- **Safety Goal:** {description}
+- **ASIL:** {asil}
+- **Safe State:** {safe_state}
+- **FTTI:** {ftti}
 
-➡️ Step 5: Generate Functional Safety Concept work product.
+"""
 
+FSR_PROMPT_FOOTER = """
+**Requirements:**
+- Derive 5-10 FSRs per safety goal
+- Each FSR must be independently verifiable
+- Use clear, unambiguous language
+- Include specific metrics and acceptance criteria
+- Specify preliminary component allocation
+- All FSRs inherit parent Safety Goal ASIL
+- Consider all items from 7.4.2.4
+
+**Now derive functional safety requirements per ISO 26262-3:2018, 7.4.2 for all safety goals.**
+"""
+
+# Deterministic rendering of the FSRs built from the LLM field values
+FSR_SECTION_HEADER = """## FSRs for Safety Goal: {id}
+**Safety Goal:** {description}
+**ASIL:** {asil}
+**Safe State:** {safe_state}
+**FTTI:** {ftti}
+"""
+
+FSR_CATEGORY_HEADING = "\n### {category} Requirements\n"
+
+FSR_ENTRY_TEMPLATE = """
+**{id}**
+- **Description:** {description}
+- **ASIL:** {asil}
+- **Linked to SG:** {safety_goal_id}
+- **Operating Modes:** {operating_modes}
+- **Preliminary Allocation:** {allocated_to}
+- **Verification Criteria:** {verification_criteria}
 """
 
-    return summary
+FSR_SUMMARY_HEADER = """✅ **Functional Safety Requirements Derived**
+*ISO 26262-3:2018, Clause 7.4.2 compliance*
+
+**System:** {system_name}
+**Total FSRs:** {fsr_count}
+
+**Compliance Check:**
+✅ 7.4.2.1: FSRs derived from safety goals
+✅ 7.4.2.2: At least one FSR per safety goal
+✅ 7.4.2.4: FSRs consider operating modes, FTTI, safe states, redundancies
+✅ 7.4.1: FSRs specified per ISO 26262-8 requirements
+
+**FSR Distribution by Category and ASIL:**
+- See detailed analysis below.
+
+---
+
+"""
+
+FSR_SUMMARY_FOOTER = (
+    "\n\n---\n\n**Completed:**\n" + FSC_DONE_HARA + FSC_DONE_STRATEGY + FSC_DONE_FSR
+    + FSC_NEXT_STEPS_HEADING + FSC_NEXT_AFTER_FSR
+)
 
 
 @tool(
@@ -477,187 +698,280 @@ def derive_functional_safety_requirements(tool_input, cat):
     
     print("✅ TOOL CALLED: derive_functional_safety_requirements")
     
-    safety_goals = cat.working_memory.get("fsc_safety_goals", [])
-    strategies = cat.working_memory.get("fsc_safety_strategies", [])
+    wm = cat.working_memory
+    
+    safety_goals = wm.get("fsc_safety_goals", [])
+    strategies = wm.get("fsc_safety_strategies", [])
     
     if not safety_goals:
-        return """❌ No safety goals loaded.
-
-**Required Steps per ISO 26262-3:2018:**
-1. Load HARA (7.3.1): `load HARA for [item name]`
-2. Develop strategy (7.4.2.3): `develop safety strategy for all safety goals`
-3. Derive FSRs (7.4.2.1): `derive FSRs for all goals`
-"""
+        return FSR_NO_GOALS_MSG
     
-    system_name = cat.working_memory.get("system_name", "the system")
+    system_name = wm.get("system_name", "the system")
     input_str = str(tool_input).strip().lower()
     
     # Determine which goals to process
-    if "all" in input_str or input_str == "" or "safety goals" in input_str or "all goals" in input_str:
+    if means_all_goals(input_str):
         goals_to_process = safety_goals 
         log.info(f"📝 Deriving FSRs for {len(goals_to_process)} safety goals")
     else:
         sg_id = str(tool_input).strip().upper()
         if not sg_id.startswith('SG-'):
             sg_id = 'SG-' + sg_id
-        goals_to_process = [sg for sg in safety_goals if sg['id'] == sg_id]
+        sg = get_goal_index(cat).get(sg_id)
+        goals_to_process = [sg] if sg else []
         
         if not goals_to_process:
-            return f"❌ Safety Goal '{sg_id}' not found."
+            return f"❌ Safety Goal '{sg_id}' not found. Available: {get_goal_hint(cat)}..."
+    
+    # Reuse derivations of semantically equivalent goals (possibly from other projects)
+    cached_sections = []
+    cached_fsrs = []
+    goal_embeddings = {}
+    goal_namespaces = {}
+    goals_for_llm = []
+    for sg in goals_to_process:
+        # QM goals are covered by quality management, not by FSRs
+        if sg.get('asil', 'QM') == 'QM':
+            log.debug(f"⏭️ {sg['id']} is QM - no FSRs required, LLM call skipped")
+            cached_sections.append(FSR_QM_SECTION.format(sg_id=sg['id']))
+            continue
+        
+        embedding = embed_text(cat, semantic_goal_text(sg))
+        goal_embeddings[sg['id']] = embedding
+        goal_namespaces[sg['id']] = fsr_cache_namespace(sg)
+        hit = semantic_cache_lookup(goal_namespaces[sg['id']], embedding)
+        if hit:
+            source_id, cached_fields, similarity = hit
+            log.debug(f"♻️ Reusing FSR derivation of {source_id} for {sg['id']} (similarity {similarity:.3f})")
+            # Only the LLM field values are reused; IDs, ASIL and header come from this goal
+            sg_fsrs = build_goal_fsrs(sg, json.loads(cached_fields))
+            cached_fsrs.extend(sg_fsrs)
+            cached_sections.append(render_fsr_section(sg, sg_fsrs))
+        else:
+            goals_for_llm.append(sg)
+    
+    log.info(f"♻️ FSR derivation: {len(cached_sections)} goals reused or QM, {len(goals_for_llm)} sent to LLM")
     
     # Build FSR derivation prompt
-    prompt = f"""You are deriving Functional Safety Requirements (FSRs) per ISO 26262-3:2018, Clause 7.4.2.
-
-**System:** {system_name}
-**Safety Goals to Process:** {len(goals_to_process)}
-
-**ISO 26262-3:2018 Requirements:**
-
-**7.4.2.1:** FSRs shall be derived from safety goals, considering system architectural design
-**7.4.2.2:** At least one FSR shall be derived from each safety goal
-**7.4.2.4:** Each FSR shall be specified by considering, as applicable:
-   a) Operating modes
-   b) Fault tolerant time interval (FTTI)
-   c) Safe states
-   d) Emergency operation time interval
-   e) Functional redundancies
-
-**7.4.1:** FSRs shall be specified per ISO 26262-8:2018, Clause 6 (requirements specification)
-
-**Your Task:**
-For each safety goal, derive measurable, verifiable Functional Safety Requirements that implement the strategies.
-
-**FSR Categories (based on strategies from 7.4.2.3):**
-
-1. **Fault Avoidance Requirements**
-2. **Fault Detection Requirements**
-3. **Fault Control Requirements**
-4. **Safe State Transition Requirements**
-5. **Fault Tolerance Requirements**
-6. **Warning/Indication Requirements**
-7. **Timing Requirements**
-8. **Arbitration Requirements** (if applicable)
-
-**FSR Quality Criteria per ISO 26262-8:2018, Clause 6:**
-- Measurable, Verifiable, Traceable, Unambiguous, Complete, Consistent, Feasible
-
-**Output Format:**
-
----
-## FSRs for Safety Goal: [SG-ID]
-**Safety Goal:** [Description]
-**ASIL:** [X]
-**Safe State:** [Defined state]
-**FTTI:** [Value]
-
-### Fault Avoidance Requirements
-
-**FSR-[SG-ID]-AVD-1**
-- **Description:** [...]
-- **ASIL:** [...]
-- **Linked to SG:** [...]
-- **Operating Modes:** [...]
-- **Preliminary Allocation:** [...]
-- **Verification Criteria:** [...]
-
-[... repeat for other categories ...]
-
----
-
-**Safety Goals and Strategies:**
-
-"""
+    prompt_parts = [FSR_PROMPT_HEADER.format(system_name=system_name, goal_count=len(goals_for_llm))]
     
-    for sg in goals_to_process:
-        prompt += f"""
-### {sg['id']}
-- **Safety Goal:** {sg['description']}
-- **ASIL:** {sg['asil']}
-- **Safe State:** {sg.get('safe_state', 'To be specified per 7.4.2.5')}
-- **FTTI:** {sg.get('ftti', 'To be determined')}
-
-"""
+    prompt_parts.extend(format_fsr_goal_block(
+        sg['id'],
+        sg['description'],
+        sg['asil'],
+        sg.get('safe_state', 'To be specified per 7.4.2.5'),
+        sg.get('ftti', 'To be determined')
+    ) for sg in goals_for_llm)
     
-    prompt += """
-**Requirements:**
-- Derive 5-10 FSRs per safety goal
-- Each FSR must be independently verifiable
-- Use clear, unambiguous language
-- Include specific metrics and acceptance criteria
-- Specify preliminary component allocation
-- All FSRs inherit parent Safety Goal ASIL
-- Consider all items from 7.4.2.4
-
-**Now derive functional safety requirements per ISO 26262-3:2018, 7.4.2 for all safety goals.**
-"""
+    prompt_parts.append(FSR_PROMPT_FOOTER)
+    prompt = "".join(prompt_parts)
     
     try:
-        fsr_analysis = cat.llm(prompt).strip()
+        if goals_for_llm:
+            # Identical prompts (same goals, same system) reuse the stored derivation
+            llm_response = prompt_cache_lookup("fsr_derivation", prompt)
+            from_cache = llm_response is not None
+            if not from_cache:
+                llm_response = cat.llm(prompt).strip()
+            
+            # IDs, ASIL and linkage are assigned here; the LLM only supplies the text fields
+            fsrs = build_fsrs(llm_response, goals_for_llm)
+            if fsrs is not None:
+                fsrs_by_goal = group_fsrs_by_goal(fsrs)
+                sections = [
+                    (sg['id'], render_fsr_section(sg, fsrs_by_goal.get(sg['id'], [])))
+                    for sg in goals_for_llm
+                ]
+                llm_analysis = "\n\n".join(section for _, section in sections)
+            else:
+                # Free-form answer: scrape it (JSON block, markdown as fallback)
+                log.warning("⚠️ FSR field JSON missing or invalid - parsing the response text instead")
+                fsrs = parse_fsrs(llm_response, goals_for_llm)
+                fsrs_by_goal = group_fsrs_by_goal(fsrs)
+                llm_analysis = llm_response.partition(FSR_JSON_SENTINEL)[0].strip()
+                sections = split_fsr_sections(llm_analysis)
+            
+            # Only a response with FSRs for every goal is replayed; broken answers are retried
+            if not from_cache and all(fsrs_by_goal.get(sg['id']) for sg in goals_for_llm):
+                prompt_cache_store("fsr_derivation", prompt, llm_response)
+            
+            # Cache each goal's FSR field values; goals left without FSRs are not reused
+            for sg in goals_for_llm:
+                fields = fsr_cache_fields(fsrs_by_goal.get(sg['id'], []))
+                if fields:
+                    semantic_cache_store(
+                        goal_namespaces[sg['id']], sg['id'], goal_embeddings.get(sg['id']),
+                        json.dumps(fields)
+                    )
+        else:
+            log.info(f"♻️ All {len(goals_to_process)} safety goals served from semantic cache or QM - LLM call skipped")
+            llm_analysis = ""
+            fsrs = []
         
-        # Parse FSRs from response
-        fsrs = parse_fsrs(fsr_analysis, goals_to_process)
+        fsrs.extend(cached_fsrs)
+        fsr_analysis = "\n\n".join([llm_analysis, *cached_sections]).strip()
         
         # Validate that each safety goal has at least one FSR (per 7.4.2.2)
+        covered_goals = {f.get('safety_goal_id') for f in fsrs}
         for sg in goals_to_process:
-            sg_fsrs = [f for f in fsrs if f.get('safety_goal_id') == sg['id']]
-            if not sg_fsrs:
+            if sg['id'] not in covered_goals and sg.get('asil', 'QM') != 'QM':
                 log.warning(f"⚠️ Safety Goal {sg['id']} has no FSRs - violates 7.4.2.2")
         
         # Store in working memory
-        cat.working_memory["fsc_functional_requirements"] = fsrs
-        cat.working_memory["fsc_stage"] = "fsrs_derived"
-        cat.working_memory["document_type"] = "fsr" 
+        wm["fsc_functional_requirements"] = fsrs
+        wm["fsc_functional_requirements_by_id"] = None  # Rebuilt on next lookup
+        wm["fsc_stage"] = "fsrs_derived"
+        wm["document_type"] = "fsr" 
 
         
         # Generate summary
-        summary = f"""✅ **Functional Safety Requirements Derived**
-*ISO 26262-3:2018, Clause 7.4.2 compliance*
+        # The LLM text is copied once, into the joined result
+        return "".join([
+            FSR_SUMMARY_HEADER.format(system_name=system_name, fsr_count=len(fsrs)),
+            fsr_analysis,
+            FSR_SUMMARY_FOOTER
+        ])
+        
+    except Exception as e:
+        log.error(f"Error deriving FSRs: {e}")
+        log.error(traceback.format_exc())
+        return f"❌ Error deriving FSRs: {str(e)}"
 
-**System:** {system_name}
-**Total FSRs:** {len(fsrs)}
 
-**Compliance Check:**
-✅ 7.4.2.1: FSRs derived from safety goals
-✅ 7.4.2.2: At least one FSR per safety goal
-✅ 7.4.2.4: FSRs consider operating modes, FTTI, safe states, redundancies
-✅ 7.4.1: FSRs specified per ISO 26262-8 requirements
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
 
-**FSR Distribution by Category and ASIL:**
-- See detailed analysis below.
+# Separates the displayed markdown from the machine-readable FSR list
+FSR_JSON_SENTINEL = '---JSON---'
+
+FSR_TYPE_MAPPING = {
+    'AVD': 'Fault Avoidance',
+    'DET': 'Fault Detection',
+    'CTL': 'Fault Control',
+    'SST': 'Safe State Transition',
+    'TOL': 'Fault Tolerance',
+    'WRN': 'Warning/Indication',
+    'TIM': 'Timing',
+    'ARB': 'Arbitration'
+}
+
+# FSR type -> category code, e.g. 'Fault Detection' -> 'DET'
+FSR_TYPE_CODES = {fsr_type: code for code, fsr_type in FSR_TYPE_MAPPING.items()}
+
+# FSR type code embedded in the ID, e.g. "FSR-001-DET-1"
+FSR_TYPE_RE = re.compile(r'-(' + '|'.join(FSR_TYPE_MAPPING) + r')-')
+
+# Safety goal ID as generated by parse_safety_goals or written in the HARA
+SG_ID_RE = re.compile(r'\bSG-[A-Za-z0-9-]*[A-Za-z0-9]')
+
+# ASIL level opening a value: "B", "ASIL B", "(ASIL B)", "- ASIL-B", "[ASIL B]"
+# Ambiguous values such as "N/A" or "A/B" do not match
+FSR_ASIL_RE = re.compile(r'[\s(\[:–-]*(?:ASIL[\s-]*)?([A-D]|QM)(?![\w/-])')
+
+# Classifies a stripped LLM output line as a safety goal section header
+# ("## FSRs for Safety Goal: SG-001") or an FSR ID line ("**FSR-...**" / "- **FSR-...**")
+FSR_LINE_DISPATCH_RE = re.compile(
+    r'^(?:(?P<sg_header>#{2,}\s*FSRs for Safety Goal:)|-?\s*\*\*(?P<fsr_id>FSR-[^*]+)\*\*)'
+)
 
----
+# Bullet "label: value" line: "* Description: ...", "- ASIL: B", "- **Operating Modes:** ..."
+FSR_FIELD_RE = re.compile(
+    r'^[*-]\s*(?:\*\*)?(?P<label>[A-Za-z][A-Za-z ]*?)(?:\*\*)?:(?:\*\*)?\s*(?P<value>.*)$'
+)
 
-{fsr_analysis}
+# Lower-case attribute label -> FSR field; other labels are ignored
+FSR_FIELD_KEYS = {
+    'description': 'description',
+    'asil': 'asil',
+    'operating modes': 'operating_modes',
+    'preliminary allocation': 'allocated_to',
+    'verification criteria': 'verification_criteria'
+}
 
----
+# FSR fields the LLM writes; everything else is derived from the safety goal
+FSR_LLM_FIELDS = ('description', 'operating_modes', 'allocated_to', 'verification_criteria')
 
-**Completed:**
-- ✅ Step 1: Safety Goals extracted from HARA
-- ✅ Step 2: Safe Strategies developed for each Safety Goal (Clause 7.4.2.3)
-- ✅ Step 3: Functional Safety Requirements derived for each Safety Goal
-   
-**Next Steps per ISO 26262-3:2018 - Functional Safety Concept Development**
+@functools.lru_cache(maxsize=512)
+def format_fsr_goal_block(sg_id, description, asil, safe_state, ftti):
+    """Render one safety goal for the FSR prompt; unchanged goals reuse the rendered block"""
+    return FSR_PROMPT_GOAL_TEMPLATE.format(
+        id=sg_id,
+        description=description,
+        asil=asil,
+        safe_state=safe_state,
+        ftti=ftti
+    )
 
-➡️ Step 4: Allocate Functional Safety Requirements to system architecture components: `Allocate FSRs to system architecture`
 
-➡️ Step 4: Specify Validation Criteria with system architecture.
+# Tool input asking for every safety goal: "all", "for all goals", "safety goals"
+ALL_GOALS_RE = re.compile(r'all|safety goals')
 
-➡️ Step 5: Generate Functional Safety Concept work product.
 
-"""
-        
-        return summary
-        
+def means_all_goals(input_str):
+    """True if the (lower-cased) tool input selects all safety goals rather than one"""
+    return not input_str or ALL_GOALS_RE.search(input_str) is not None
+
+
+# Concurrent LLM calls when developing strategies for several safety goals
+STRATEGY_LLM_WORKERS = 8
+
+
+def generate_safety_strategy(cat, sg_id, prompt):
+    """
+    Ask the LLM for one safety goal's strategy narrative.
+    Runs in a worker thread; failures become a placeholder narrative.
+    
+    Returns:
+        tuple: (narrative, ok) - ok is False for placeholders, which are not cached
+    """
+    try:
+        response = cat.llm(prompt).strip()
+        if not response or "error" in response.lower():
+            return f"## Safety Strategy for {sg_id}: [Generation failed – manual review required]\n\nStrategy could not be generated automatically. Requires expert input per ISO 26262.", False
+        return response, True
     except Exception as e:
-        log.error(f"Error deriving FSRs: {e}")
-        import traceback
-        log.error(traceback.format_exc())
-        return f"❌ Error deriving FSRs: {str(e)}"
+        log.error(f"LLM call failed for {sg_id}: {e}")
+        return f"## Safety Strategy for {sg_id}: [Error]\n\nFailed to generate: {str(e)}", False
 
 
-# ============================================================================
-# HELPER FUNCTIONS
-# ============================================================================
+def get_goal_index(cat):
+    """
+    Return {goal_id: goal} for the loaded safety goals.
+    Cached in working memory and rebuilt when the goal list is replaced
+    (e.g. reloaded by the HARA plugin) or changes size.
+    """
+    wm = cat.working_memory
+    safety_goals = wm.get("fsc_safety_goals", [])
+    index = wm.get("fsc_safety_goals_index")
+    
+    if (index is None
+            or wm.get("fsc_safety_goals_index_source") is not safety_goals
+            or wm.get("fsc_safety_goals_index_size") != len(safety_goals)):
+        index = {sg['id']: sg for sg in safety_goals}
+        wm["fsc_safety_goals_index"] = index
+        wm["fsc_safety_goals_index_source"] = safety_goals
+        wm["fsc_safety_goals_index_size"] = len(safety_goals)
+        wm["fsc_safety_goals_hint"] = None
+    
+    return index
+
+
+def get_goal_hint(cat):
+    """
+    Return the "Available: SG-001, ..." hint shown when a goal ID is mistyped.
+    Cached in working memory until the safety goals change.
+    """
+    wm = cat.working_memory
+    get_goal_index(cat)  # Resets the hint if the goal list changed
+    hint = wm.get("fsc_safety_goals_hint")
+    
+    if hint is None:
+        hint = ', '.join(sg['id'] for sg in wm.get("fsc_safety_goals", [])[:5])
+        wm["fsc_safety_goals_hint"] = hint
+    
+    return hint
+
 
 def find_hara_data(cat, item_name):
     """Mock implementation - replace with real logic in your plugin"""
@@ -682,94 +996,278 @@ def parse_safety_goals(hara_data):
     return hara_data['goals']
 
 
+def semantic_goal_text(sg):
+    """Text embedded to recognize paraphrased safety goals across projects"""
+    return "\n".join([
+        sg.get('description', ''),
+        sg.get('hazardous_event', ''),
+        sg.get('operational_situation', '')
+    ]).strip()
+
+
+def fsr_cache_namespace(sg):
+    """
+    Semantic cache namespace for one goal's FSR derivation.
+    Reuse is limited to goals with the same ASIL, safe state and FTTI, which the
+    cached FSR field values were written for.
+    """
+    return "fsr_fields|" + "|".join(
+        str(sg.get(key, '')).strip() for key in ('asil', 'safe_state', 'ftti')
+    )
+
+
+def split_fsr_sections(llm_response):
+    """
+    Split an FSR derivation into per-safety-goal sections.
+    Returns list of (sg_id, section_text) tuples.
+    """
+    sections = []
+    for section in re.split(r'(?m)^(?=## FSRs for Safety Goal:)', llm_response):
+        if not section.startswith('## FSRs for Safety Goal:'):
+            continue
+        match = SG_ID_RE.search(section.partition('\n')[0])
+        if match:
+            sections.append((match.group(), section.strip()))
+    return sections
+
+
+def fsr_type_from_id(fsr_id):
+    """Determine FSR category from the type code embedded in its ID"""
+    match = FSR_TYPE_RE.search(fsr_id)
+    return FSR_TYPE_MAPPING[match.group(1)] if match else 'General'
+
+
+def fsr_asil(text, inherited_asil):
+    """
+    ASIL stated by the LLM for an FSR, if it names a valid level.
+    FSRs inherit the safety goal ASIL (7.4.2.8.a), so anything else keeps the inherited value.
+    """
+    match = FSR_ASIL_RE.match(text)
+    return match.group(1) if match else inherited_asil
+
+
+def new_fsr(fsr_id, sg, fsr_type):
+    """Create an empty FSR entry inheriting context from its safety goal"""
+    return {
+        'id': fsr_id,
+        'safety_goal_id': sg['id'],
+        'safety_goal': sg['description'],
+        'asil': sg['asil'],
+        'type': fsr_type,
+        'description': '',
+        'operating_modes': '',
+        'allocated_to': '',
+        'verification_criteria': '',
+        'timing': sg.get('ftti', 'To be determined'),
+        'safe_state': sg.get('safe_state', ''),
+        'emergency_operation': '',
+        'functional_redundancy': ''
+    }
+
+
+def build_fsrs(llm_response, safety_goals):
+    """
+    Build FSRs from the per-goal field values returned by the LLM.
+    IDs are numbered per category ("FSR-SG-001-DET-1"), ASIL and safety goal
+    linkage are inherited here rather than generated.
+    Returns None if the response holds no JSON object so the caller can fall back.
+    """
+    start, end = llm_response.find('{'), llm_response.rfind('}')
+    if start == -1 or end < start:
+        return None
+    
+    try:
+        fields_by_goal = json.loads(llm_response[start:end + 1])
+    except json.JSONDecodeError as e:
+        log.warning(f"⚠️ Could not decode FSR field JSON: {e}")
+        return None
+    
+    # A stray object (e.g. inside a legacy markdown answer) names none of the goals
+    if not isinstance(fields_by_goal, dict) or not any(sg['id'] in fields_by_goal for sg in safety_goals):
+        return None
+    
+    fsrs = []
+    for sg in safety_goals:
+        fsrs.extend(build_goal_fsrs(sg, fields_by_goal.get(sg['id']) or []))
+    
+    log.info(f"✅ Built {len(fsrs)} FSRs from LLM field values")
+    return fsrs
+
+
+def build_goal_fsrs(sg, items):
+    """
+    Build one safety goal's FSRs from field values ({"category": "DET", "description": ...}).
+    Used for LLM output and for field values reused from the semantic cache.
+    """
+    items_by_code = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        code = str(item.get('category', '')).strip().upper()
+        if code not in FSR_TYPE_MAPPING:
+            log.warning(f"⚠️ Ignoring FSR for {sg['id']} with unknown category '{code}'")
+            continue
+        items_by_code.setdefault(code, []).append(item)
+    
+    # Emit in category order so IDs and the rendered sections agree
+    fsrs = []
+    for code, fsr_type in FSR_TYPE_MAPPING.items():
+        for n, item in enumerate(items_by_code.get(code, []), 1):
+            fsr = new_fsr(f"FSR-{sg['id']}-{code}-{n}", sg, fsr_type)
+            for field in FSR_LLM_FIELDS:
+                if item.get(field):
+                    fsr[field] = str(item[field]).strip()
+            fsrs.append(fsr)
+    return fsrs
+
+
+def fsr_cache_fields(fsrs):
+    """
+    Field values of one goal's FSRs as stored in the semantic cache.
+    IDs, ASIL and goal linkage are left out and rebuilt for the goal reusing them.
+    """
+    fields = []
+    for fsr in fsrs:
+        code = FSR_TYPE_CODES.get(fsr['type'])
+        if code is None:
+            match = FSR_TYPE_RE.search(fsr['id'])
+            code = match and match.group(1)
+        if code:
+            fields.append({'category': code, **{field: fsr[field] for field in FSR_LLM_FIELDS}})
+    return fields
+
+
+def group_fsrs_by_goal(fsrs):
+    """Return {safety_goal_id: [fsr, ...]} preserving FSR order"""
+    fsrs_by_goal = {}
+    for fsr in fsrs:
+        fsrs_by_goal.setdefault(fsr['safety_goal_id'], []).append(fsr)
+    return fsrs_by_goal
+
+
+def render_fsr_section(sg, fsrs):
+    """Render one safety goal's FSRs as the markdown section shown to the user"""
+    parts = [FSR_SECTION_HEADER.format(
+        id=sg['id'],
+        description=sg['description'],
+        asil=sg['asil'],
+        safe_state=sg.get('safe_state', 'To be specified per 7.4.2.5'),
+        ftti=sg.get('ftti', 'To be determined')
+    )]
+    current_type = None
+    for fsr in fsrs:
+        if fsr['type'] != current_type:
+            current_type = fsr['type']
+            parts.append(FSR_CATEGORY_HEADING.format(category=current_type))
+        parts.append(FSR_ENTRY_TEMPLATE.format_map(fsr))
+    return "".join(parts).strip()
+
+
 def parse_fsrs(llm_response, safety_goals):
     """
     Parse FSRs from LLM response.
+    Uses the JSON block after the ---JSON--- sentinel when present and valid,
+    otherwise falls back to scraping the markdown.
+    """
+    markdown, _, json_text = llm_response.partition(FSR_JSON_SENTINEL)
+    
+    if json_text.strip():
+        fsrs = parse_fsrs_json(json_text, safety_goals)
+        if fsrs is not None:
+            log.info(f"✅ Parsed {len(fsrs)} FSRs from JSON block")
+            return fsrs
+        log.warning("⚠️ FSR JSON block invalid - falling back to markdown parsing")
+    
+    return parse_fsrs_markdown(markdown, safety_goals)
+
+
+def parse_fsrs_json(json_text, safety_goals):
+    """
+    Parse FSRs from the JSON array emitted by the LLM.
+    Returns None if the block is not valid JSON so the caller can fall back.
+    """
+    # Tolerate markdown fences or stray text around the array
+    start, end = json_text.find('['), json_text.rfind(']')
+    if start == -1 or end < start:
+        return None
+    
+    try:
+        items = json.loads(json_text[start:end + 1])
+    except json.JSONDecodeError as e:
+        log.warning(f"⚠️ Could not decode FSR JSON: {e}")
+        return None
+    
+    goals_by_id = {sg['id']: sg for sg in safety_goals}
+    fsrs = []
+    
+    for item in items:
+        if not isinstance(item, dict) or not item.get('id'):
+            continue
+        
+        sg = goals_by_id.get(item.get('safety_goal_id'))
+        if not sg:
+            log.warning(f"⚠️ FSR {item.get('id')} references unknown safety goal {item.get('safety_goal_id')}")
+            continue
+        
+        fsr_id = str(item['id']).strip()
+        fsr = new_fsr(fsr_id, sg, item.get('type') or fsr_type_from_id(fsr_id))
+        for field in FSR_LLM_FIELDS:
+            if item.get(field):
+                fsr[field] = str(item[field]).strip()
+        fsr['asil'] = fsr_asil(str(item.get('asil', '')), fsr['asil'])
+        fsrs.append(fsr)
+    
+    return fsrs
+
+
+def parse_fsrs_markdown(llm_response, safety_goals):
+    """
+    Parse FSRs from the markdown part of the LLM response.
     Extracts all fields: ID, Description, ASIL, Operating Modes, Allocation, Verification.
     """
     fsrs = []
     current_sg = None
     current_fsr = None
+    goals_by_id = {sg['id']: sg for sg in safety_goals}
     
     lines = llm_response.split('\n')
     
-    # Type mapping
-    type_mapping = {
-        'AVD': 'Fault Avoidance',
-        'DET': 'Fault Detection',
-        'CTL': 'Fault Control',
-        'SST': 'Safe State Transition',
-        'TOL': 'Fault Tolerance',
-        'WRN': 'Warning/Indication',
-        'TIM': 'Timing',
-        'ARB': 'Arbitration'
-    }
-    
     for line in lines:
         line_stripped = line.strip()
         
+        # One match classifies the line as safety goal header or FSR ID line
+        line_kind = FSR_LINE_DISPATCH_RE.match(line_stripped)
+        
         # Detect safety goal section
-        if '## FSRs for Safety Goal:' in line_stripped:
-            for sg in safety_goals:
-                if sg['id'] in line_stripped:
-                    current_sg = sg
-                    break
+        if line_kind and line_kind.lastgroup == 'sg_header':
+            sg_match = SG_ID_RE.search(line_stripped, line_kind.end())
+            if sg_match and sg_match.group() in goals_by_id:
+                current_sg = goals_by_id[sg_match.group()]
         
         # Detect FSR ID line
-        if line_stripped.startswith('**FSR-') and current_sg:
+        elif line_kind and current_sg:
             # Save previous FSR if exists
             if current_fsr:
                 fsrs.append(current_fsr)
             
-            # Extract FSR ID (remove ** markers)
-            fsr_id = line_stripped.replace('**', '').strip()
+            # Extract FSR ID (without ** markers)
+            fsr_id = line_kind.group('fsr_id').strip()
             
-            # Determine type from ID
-            fsr_type = 'General'
-            for type_code, type_name in type_mapping.items():
-                if f'-{type_code}-' in fsr_id:
-                    fsr_type = type_name
-                    break
+            # Create new FSR entry, type determined from ID
+            current_fsr = new_fsr(fsr_id, current_sg, fsr_type_from_id(fsr_id))
             
-            # Create new FSR entry
-            current_fsr = {
-                'id': fsr_id,
-                'safety_goal_id': current_sg['id'],
-                'safety_goal': current_sg['description'],
-                'asil': current_sg['asil'],
-                'type': fsr_type,
-                'description': '',
-                'operating_modes': '',
-                'allocated_to': '',
-                'verification_criteria': '',
-                'timing': current_sg.get('ftti', 'To be determined'),
-                'safe_state': current_sg.get('safe_state', ''),
-                'emergency_operation': '',
-                'functional_redundancy': ''
-            }
+            # Optional "(ASIL X)" marker after the ID
+            if 'ASIL' in line_stripped:
+                current_fsr['asil'] = fsr_asil(line_stripped[line_kind.end():], current_fsr['asil'])
         
-        # Extract FSR fields (lines starting with "* " or "- ")
-        if current_fsr:
-            # Handle both "* Description:" and "- Description:" formats
-            if line_stripped.startswith('* Description:') or line_stripped.startswith('- Description:'):
-                desc = line_stripped.replace('* Description:', '').replace('- Description:', '').strip()
-                current_fsr['description'] = desc
-            
-            elif line_stripped.startswith('* ASIL:') or line_stripped.startswith('- ASIL:'):
-                asil = line_stripped.replace('* ASIL:', '').replace('- ASIL:', '').strip()
-                current_fsr['asil'] = asil
-            
-            elif line_stripped.startswith('* Operating Modes:') or line_stripped.startswith('- Operating Modes:'):
-                modes = line_stripped.replace('* Operating Modes:', '').replace('- Operating Modes:', '').strip()
-                current_fsr['operating_modes'] = modes
-            
-            elif line_stripped.startswith('* Preliminary Allocation:') or line_stripped.startswith('- Preliminary Allocation:'):
-                alloc = line_stripped.replace('* Preliminary Allocation:', '').replace('- Preliminary Allocation:', '').strip()
-                current_fsr['allocated_to'] = alloc
-            
-            elif line_stripped.startswith('* Verification Criteria:') or line_stripped.startswith('- Verification Criteria:'):
-                verif = line_stripped.replace('* Verification Criteria:', '').replace('- Verification Criteria:', '').strip()
-                current_fsr['verification_criteria'] = verif
+        # Extract FSR fields ("* Description:", "- Description:" or bold "- **Description:**")
+        elif current_fsr:
+            field_match = FSR_FIELD_RE.match(line_stripped)
+            field = field_match and FSR_FIELD_KEYS.get(field_match.group('label').lower())
+            if field == 'asil':
+                current_fsr['asil'] = fsr_asil(field_match.group('value'), current_fsr['asil'])
+            elif field:
+                current_fsr[field] = field_match.group('value').strip()
     
     # Save last FSR
     if current_fsr:
@@ -779,6 +1277,6 @@ def parse_fsrs(llm_response, safety_goals):
     
     # Debug: Log first FSR to verify parsing
     if fsrs:
-        log.info(f"📝 Sample FSR: {fsrs[0]['id']} - {fsrs[0]['description'][:50]}...")
+        log.debug(f"📝 Sample FSR: {fsrs[0]['id']} - {fsrs[0]['description'][:50]}...")
     
     return fsrs
\ No newline at end of file
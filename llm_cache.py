@@ -0,0 +1,230 @@
+# llm_cache.py
+# Persistent LLM response caches for FSC Developer Plugin
+# Reuses prior derivations across chat sessions and projects
+
+from cat.log import log
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import time
+
+
+CACHE_FOLDER = os.path.join(os.path.dirname(__file__), "cache")
+SEMANTIC_CACHE_PATH = os.path.join(CACHE_FOLDER, "semantic_cache.sqlite3")
+
+# Paraphrased safety goals ("loss of braking" vs "brake system failure")
+# typically score above this cosine similarity, unrelated goals well below
+SEMANTIC_SIMILARITY_THRESHOLD = 0.92
+SEMANTIC_CACHE_TTL = 30 * 24 * 60 * 60  # 30 days, in seconds
+
+_semantic_stats = {"hits": 0, "misses": 0}
+_prompt_stats = {"hits": 0, "misses": 0}
+
+
+def _connect_cache():
+    """
+    Open the cache database, creating its tables on first use.
+    Holds both the semantic cache and the exact-prompt response cache.
+    """
+
+    os.makedirs(CACHE_FOLDER, exist_ok=True)
+    conn = sqlite3.connect(SEMANTIC_CACHE_PATH)
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS semantic_cache (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            namespace TEXT NOT NULL,
+            source_id TEXT NOT NULL,
+            embedding TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created REAL NOT NULL
+        )"""
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_semantic_namespace ON semantic_cache (namespace, created)"
+    )
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS prompt_cache (
+            prompt_hash TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            created REAL NOT NULL
+        )"""
+    )
+    return conn
+
+
+def _prompt_hash(namespace, prompt):
+    """
+    Stable key for an exact prompt within a namespace.
+    """
+
+    return hashlib.sha256(f"{namespace}\0{prompt}".encode()).hexdigest()
+
+
+def prompt_cache_lookup(namespace, prompt):
+    """
+    Return the stored LLM response for this exact prompt, or None.
+    Entries older than the TTL are ignored.
+    """
+
+    try:
+        conn = _connect_cache()
+        try:
+            row = conn.execute(
+                "SELECT response FROM prompt_cache WHERE prompt_hash = ? AND created >= ?",
+                (_prompt_hash(namespace, prompt), time.time() - SEMANTIC_CACHE_TTL)
+            ).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        log.error(f"❌ Prompt cache lookup failed: {e}")
+        return None
+
+    if row:
+        _prompt_stats["hits"] += 1
+    else:
+        _prompt_stats["misses"] += 1
+
+    total = _prompt_stats["hits"] + _prompt_stats["misses"]
+    log.info(
+        f"⚡ Prompt cache {'hit' if row else 'miss'} ({namespace}) - "
+        f"hit rate {_prompt_stats['hits']}/{total} ({_prompt_stats['hits'] / total:.0%})"
+    )
+
+    return row[0] if row else None
+
+
+def prompt_cache_store(namespace, prompt, response):
+    """
+    Store the LLM response for an exact prompt and drop expired entries.
+    """
+
+    if not response:
+        return
+
+    try:
+        conn = _connect_cache()
+        try:
+            with conn:
+                now = time.time()
+                conn.execute(
+                    "DELETE FROM prompt_cache WHERE created < ?",
+                    (now - SEMANTIC_CACHE_TTL,)
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO prompt_cache (prompt_hash, response, created) VALUES (?, ?, ?)",
+                    (_prompt_hash(namespace, prompt), response, now)
+                )
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        log.error(f"❌ Prompt cache store failed: {e}")
+
+
+def _normalize(vector):
+    """
+    Scale an embedding to unit length so cosine similarity is a dot product.
+    """
+
+    norm = math.sqrt(sum(x * x for x in vector))
+    if not norm:
+        return None
+    return [x / norm for x in vector]
+
+
+def embed_text(cat, text):
+    """
+    Embed text with the Cat embedder.
+    Returns a unit-length vector, or None if no embedder is available.
+    """
+
+    try:
+        return _normalize(cat.embedder.embed_query(text))
+    except Exception as e:
+        log.warning(f"⚠️ Embedding failed, semantic cache disabled for this call: {e}")
+        return None
+
+
+def semantic_cache_lookup(namespace, embedding, threshold=SEMANTIC_SIMILARITY_THRESHOLD, source_id=None):
+    """
+    Find the closest cached response within the TTL.
+    With source_id set, only entries stored under that id are considered.
+
+    Returns:
+        tuple: (source_id, response, similarity) or None on a miss
+    """
+
+    if embedding is None:
+        return None
+
+    best = None
+    best_similarity = threshold
+
+    query = (
+        "SELECT source_id, embedding, response FROM semantic_cache "
+        "WHERE namespace = ? AND created >= ?"
+    )
+    params = [namespace, time.time() - SEMANTIC_CACHE_TTL]
+    if source_id is not None:
+        query += " AND source_id = ?"
+        params.append(source_id)
+
+    try:
+        conn = _connect_cache()
+        try:
+            rows = conn.execute(query, params)
+            for entry_id, stored, response in rows:
+                stored = json.loads(stored)
+                if len(stored) != len(embedding):
+                    continue  # Embedder changed since this entry was stored
+                similarity = sum(a * b for a, b in zip(embedding, stored))
+                if similarity >= best_similarity:
+                    best = (entry_id, response, similarity)
+                    best_similarity = similarity
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        log.error(f"❌ Semantic cache lookup failed: {e}")
+        return None
+
+    if best:
+        _semantic_stats["hits"] += 1
+    else:
+        _semantic_stats["misses"] += 1
+
+    total = _semantic_stats["hits"] + _semantic_stats["misses"]
+    log.info(
+        f"🧠 Semantic cache {'hit' if best else 'miss'} ({namespace}) - "
+        f"hit rate {_semantic_stats['hits']}/{total} ({_semantic_stats['hits'] / total:.0%})"
+    )
+
+    return best
+
+
+def semantic_cache_store(namespace, source_id, embedding, response):
+    """
+    Store an LLM response under its embedding and drop expired entries.
+    """
+
+    if embedding is None or not response:
+        return
+
+    try:
+        conn = _connect_cache()
+        try:
+            with conn:
+                now = time.time()
+                conn.execute(
+                    "DELETE FROM semantic_cache WHERE created < ?",
+                    (now - SEMANTIC_CACHE_TTL,)
+                )
+                conn.execute(
+                    "INSERT INTO semantic_cache (namespace, source_id, embedding, response, created) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (namespace, source_id, json.dumps(embedding), response, now)
+                )
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        log.error(f"❌ Semantic cache store failed: {e}")
@@ -3,8 +3,29 @@
 # Robust HARA parsing supporting multiple formats
 
 from cat.log import log
+import functools
 import os
 import re
+import traceback
+import weakref
+
+# ASIL ratings that require safety goals, and all valid HARA ratings
+ASIL_LEVELS = frozenset(('A', 'B', 'C', 'D'))
+HARA_RATINGS = ASIL_LEVELS | {'QM'}
+
+# Consecutive empty rows after which the HARA table is considered finished
+HARA_BLANK_ROW_LIMIT = 50
+
+# Leading rows searched for the HARA header row (title and blank rows may precede it)
+HARA_HEADER_SCAN_ROWS = 10
+
+# Header substrings marking a HARA sheet (first row) and a HARA header row
+HARA_SHEET_INDICATORS = ('hazard', 'asil', 'safety goal', 'severity',
+                         'exposure', 'controllability', 'risk')
+HARA_HEADER_INDICATORS = ('asil', 'safety goal', 'hazard', 'severity', 'exposure', 'controllability')
+
+# Single-letter S/E/C rating columns of a HARA table
+SEC_HEADERS = frozenset(('s', 'e', 'c'))
 
 
 def find_hara_data(cat, item_name):
@@ -28,43 +49,19 @@ def find_hara_data(cat, item_name):
     
     log.info(f"📁 Looking in folder: {hara_folder}")
     
-    if not os.path.exists(hara_folder):
-        log.warning(f"⚠️ Folder doesn't exist: {hara_folder}")
-        log.info(f"Creating hara_inputs folder: {hara_folder}")
-        os.makedirs(hara_folder, exist_ok=True)
-        return None
+    # No-op when the folder exists; a new empty folder simply has no HARA files
+    os.makedirs(hara_folder, exist_ok=True)
     
-    # List all files in folder
+    # List Excel files in folder (cached until the folder changes)
     try:
-        all_files = os.listdir(hara_folder)
-        log.info(f"📋 Files in folder: {all_files}")
+        excel_files = list_hara_folder(hara_folder)
+        log.info(f"📋 Excel files in folder: {[filename for filename, _ in excel_files]}")
     except Exception as e:
         log.error(f"❌ Error listing folder: {e}")
         return None
     
     # Look for Excel files matching item name or any HARA file
-    safe_name = "".join(c if c.isalnum() or c in "._- " else "_" 
-                       for c in item_name).replace(" ", "_")
-    
-    log.info(f"🔍 Safe name for matching: {safe_name}")
-    
-    hara_files = []
-    for filename in all_files:
-        # Skip temporary Excel files (created when file is open)
-        if filename.startswith('~$'):
-            log.debug(f"⏭️ Skipping temp file: {filename}")
-            continue
-            
-        if filename.endswith('.xlsx') or filename.endswith('.xls'):
-            log.info(f"📄 Found Excel file: {filename}")
-            # Prioritize files matching item name
-            filename_lower = filename.lower()
-            if safe_name.lower() in filename_lower or any(word.lower() in filename_lower for word in item_name.split()):
-                log.info(f"✅ File matches item name: {filename}")
-                hara_files.insert(0, filename)
-            elif 'hara' in filename_lower:
-                log.info(f"➕ File contains 'hara': {filename}")
-                hara_files.append(filename)
+    hara_files = rank_hara_files(excel_files, item_name.strip().lower())
     
     if not hara_files:
         log.warning(f"❌ No HARA Excel files found in {hara_folder}")
@@ -78,34 +75,44 @@ def find_hara_data(cat, item_name):
         log.info(f"📖 Attempting to read HARA file: {filename}")
         
         try:
-            import openpyxl
-            wb = openpyxl.load_workbook(filepath, data_only=True)
-            log.info(f"✅ Workbook loaded, sheets: {wb.sheetnames}")
-            
-            # Try to find the HARA worksheet
-            ws = find_hara_worksheet(wb)
-            if not ws:
-                log.warning(f"⚠️ No HARA worksheet found in {filename}")
-                continue
-            
-            log.info(f"✅ Found HARA worksheet: {ws.title}")
+            # Reuse the parsed rows while the file is unchanged on disk
+            mtime = os.stat(filepath).st_mtime_ns
+            cached = _HARA_PARSE_CACHE.get(filepath)
+            if cached and cached[0] == mtime:
+                log.info(f"♻️ Reusing parsed HARA rows from {filename} (file unchanged)")
+                return cached[1]
             
-            # Parse HARA data with flexible column mapping
-            hara_data = parse_hara_worksheet(ws)
-            
-            if hara_data:
-                log.info(f"✅ Successfully parsed {len(hara_data)} rows from {filename}")
-                log.info(f"📊 Sample row keys: {list(hara_data[0].keys()) if hara_data else 'No data'}")
-                return hara_data
-            else:
-                log.warning(f"⚠️ No valid data found in {filename}")
+            wb = load_hara_workbook(filepath)
+            try:
+                log.info(f"✅ Workbook loaded, sheets: {wb.sheetnames}")
+                
+                # Try to find the HARA worksheet
+                ws = find_hara_worksheet(wb)
+                if not ws:
+                    log.warning(f"⚠️ No HARA worksheet found in {filename}")
+                    continue
+                
+                log.info(f"✅ Found HARA worksheet: {ws.title}")
+                
+                # Parse HARA data with flexible column mapping
+                hara_data = parse_hara_worksheet(ws)
+                
+                if hara_data:
+                    log.info(f"✅ Successfully parsed {len(hara_data)} rows from {filename}")
+                    log.info(f"📊 Sample row keys: {list(hara_data[0].keys()) if hara_data else 'No data'}")
+                    _HARA_PARSE_CACHE[filepath] = (mtime, hara_data)
+                    return hara_data
+                else:
+                    log.warning(f"⚠️ No valid data found in {filename}")
+            finally:
+                # Read-only workbooks keep the file open until closed
+                wb.close()
                 
         except ImportError:
-            log.error("❌ openpyxl not installed - cannot read Excel files")
+            log.error("❌ Neither python-calamine nor openpyxl installed - cannot read Excel files")
             return None
         except Exception as e:
             log.error(f"❌ Error reading HARA file {filename}: {e}")
-            import traceback
             log.error(traceback.format_exc())
             continue
     
@@ -113,6 +120,169 @@ def find_hara_data(cat, item_name):
     return None
 
 
+# hara_inputs folder -> (mtime_ns, ((filename, lowercase filename), ...))
+_HARA_FOLDER_CACHE = {}
+
+# HARA file path -> (mtime_ns, parsed rows)
+_HARA_PARSE_CACHE = {}
+
+
+def list_hara_folder(hara_folder):
+    """
+    List the Excel files in the hara_inputs folder.
+    The listing is cached and only rebuilt when the folder's mtime changes
+    (a file was added, removed or renamed).
+    
+    Returns:
+        tuple: (filename, lowercase filename) tuples
+    """
+    
+    mtime = os.stat(hara_folder).st_mtime_ns
+    cached = _HARA_FOLDER_CACHE.get(hara_folder)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    
+    excel_files = []
+    with os.scandir(hara_folder) as entries:
+        for entry in entries:
+            filename = entry.name
+            # Skip temporary Excel files (created when file is open)
+            if filename.startswith('~$'):
+                log.debug(f"⏭️ Skipping temp file: {filename}")
+                continue
+            filename_lower = filename.lower()
+            # DirEntry carries the file type from the directory read, no extra stat
+            if filename_lower.endswith(('.xlsx', '.xls')) and entry.is_file():
+                excel_files.append((filename, filename_lower))
+    
+    excel_files = tuple(excel_files)
+    _HARA_FOLDER_CACHE[hara_folder] = (mtime, excel_files)
+    return excel_files
+
+
+# Characters replaced by '_' when matching an item name against file names
+# (spaces included, so "wiper system" matches "wiper_system_hara.xlsx")
+UNSAFE_FILENAME_CHAR_RE = re.compile(r'[^\w.-]')
+
+
+@functools.lru_cache(maxsize=32)
+def rank_hara_files(excel_files, item_name):
+    """
+    Order the HARA candidates for an item: files matching the item name first,
+    then any other file with 'hara' in its name.
+    Cached per folder listing and normalized item name, so repeated loads of the
+    same item skip the matching; a changed folder yields a new listing key.
+    
+    Args:
+        excel_files: Tuple from list_hara_folder
+        item_name: Item name, stripped and lower-cased
+    
+    Returns:
+        tuple: Filenames to try, in order
+    """
+    
+    safe_name = UNSAFE_FILENAME_CHAR_RE.sub("_", item_name)
+    
+    log.info(f"🔍 Safe name for matching: {safe_name}")
+    
+    item_words = item_name.split()
+    
+    hara_files = []
+    for filename, filename_lower in excel_files:
+        # Prioritize files matching item name
+        if safe_name in filename_lower or any(word in filename_lower for word in item_words):
+            log.info(f"✅ File matches item name: {filename}")
+            hara_files.insert(0, filename)
+        elif 'hara' in filename_lower:
+            log.info(f"➕ File contains 'hara': {filename}")
+            hara_files.append(filename)
+    
+    return tuple(hara_files)
+
+
+def load_hara_workbook(filepath):
+    """
+    Open a HARA workbook for reading.
+    Uses python-calamine when installed, otherwise openpyxl in read-only mode.
+    Both expose the openpyxl worksheet subset used by the HARA parsers.
+    
+    Excel readers are imported here, on first use, so loading the plugin
+    and tools that never read a workbook don't pay their import cost.
+    """
+    
+    # Optional: Rust-based XLSX/XLS reader, much faster than openpyxl on large HARAs
+    try:
+        from python_calamine import CalamineWorkbook
+    except ImportError:
+        CalamineWorkbook = None
+    
+    if CalamineWorkbook is not None:
+        log.info("⚡ Reading workbook with python-calamine")
+        return RowsWorkbook(CalamineWorkbook.from_path(filepath))
+    
+    import openpyxl
+    # Read-only mode streams the sheet XML instead of building the full DOM;
+    # external workbook links are never followed, so skip loading them
+    return openpyxl.load_workbook(filepath, data_only=True, read_only=True, keep_links=False)
+
+
+class RowsWorksheet:
+    """
+    Read-only worksheet over rows already loaded by python-calamine.
+    Implements the openpyxl worksheet subset used here: title, max_row
+    and iter_rows(values_only=True).
+    """
+    
+    def __init__(self, title, rows):
+        self.title = title
+        self._rows = rows
+        self.max_row = len(rows)
+    
+    def iter_rows(self, min_row=1, max_row=None, max_col=None, values_only=True):
+        for row in self._rows[min_row - 1:max_row]:
+            yield row[:max_col] if max_col else row
+
+
+class RowsWorkbook:
+    """
+    Workbook wrapper around a CalamineWorkbook with the openpyxl API used here.
+    Sheets are converted on first access.
+    """
+    
+    def __init__(self, calamine_workbook):
+        self._workbook = calamine_workbook
+        self._sheets = {}
+        self.sheetnames = list(calamine_workbook.sheet_names)
+    
+    def __getitem__(self, sheet_name):
+        if sheet_name not in self._sheets:
+            rows = self._workbook.get_sheet_by_name(sheet_name).to_python(skip_empty_area=False)
+            self._sheets[sheet_name] = RowsWorksheet(
+                sheet_name, [tuple(_calamine_value(v) for v in row) for row in rows]
+            )
+        return self._sheets[sheet_name]
+    
+    @property
+    def worksheets(self):
+        return [self[name] for name in self.sheetnames]
+    
+    @property
+    def active(self):
+        return self[self.sheetnames[0]] if self.sheetnames else None
+    
+    def close(self):
+        self._sheets.clear()
+
+
+def _calamine_value(value):
+    """Match openpyxl cell values: None for empty cells, int for whole numbers"""
+    if value == '':
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
 def find_hara_worksheet(workbook):
     """
     Find the worksheet containing HARA data.
@@ -162,24 +332,68 @@ def find_hara_worksheet(workbook):
     return None
 
 
+# Worksheet -> its first HARA_HEADER_SCAN_ROWS rows; entries go with the workbook
+_LEADING_ROWS_CACHE = weakref.WeakKeyDictionary()
+
+
+def read_leading_rows(worksheet):
+    """
+    First HARA_HEADER_SCAN_ROWS rows of a worksheet as value tuples.
+    Read once per sheet and shared by the sheet checks, header detection and
+    header extraction: read-only sheets re-parse their XML on every pass
+    (and on every ws[row] access) and may report max_row as None.
+    """
+    
+    rows = _LEADING_ROWS_CACHE.get(worksheet)
+    if rows is None:
+        rows = list(worksheet.iter_rows(min_row=1, max_row=HARA_HEADER_SCAN_ROWS, values_only=True))
+        _LEADING_ROWS_CACHE[worksheet] = rows
+    return rows
+
+
+def iter_header_candidates(rows):
+    """
+    Yield (row_idx, headers) for the leading rows that could hold column headers.
+    Headers are lowercased and stripped (empty cells become '').
+    Empty rows and title rows (a single filled cell) are skipped.
+    Shared by has_required_hara_columns() and find_header_row().
+    """
+    
+    for row_idx, row in enumerate(rows, start=1):
+        headers = [str(value).lower().strip() if value else '' 
+                   for value in row]
+        
+        # Skip completely empty rows
+        non_empty = [h for h in headers if h]
+        if len(non_empty) == 0:
+            log.debug(f"  Row {row_idx}: Empty row, skipping")
+            continue
+        
+        # Skip if this looks like a title row (single cell with content, rest empty)
+        if len(non_empty) == 1:
+            log.debug(f"  Row {row_idx}: Title row - {non_empty[0][:50]}")
+            continue
+        
+        yield row_idx, headers
+
+
 def has_hara_data(worksheet):
     """
     Check if worksheet contains HARA-like data.
     """
     
-    if worksheet.max_row < 2:
+    rows = read_leading_rows(worksheet)
+    if len(rows) < 2:
         return False
     
     # Check first row for HARA-related headers
-    first_row = [str(cell.value).lower() if cell.value else '' 
-                 for cell in worksheet[1]]
+    first_row = [str(value).lower() if value else '' 
+                 for value in rows[0]]
     
     log.debug(f"🔍 Checking sheet '{worksheet.title}' headers: {first_row[:5]}...")
     
-    hara_indicators = ['hazard', 'asil', 'safety goal', 'severity', 
-                       'exposure', 'controllability', 'risk']
-    
-    has_data = any(indicator in ' '.join(first_row) for indicator in hara_indicators)
+    header_text = ' '.join(first_row)
+    has_data = any(indicator in header_text for indicator in HARA_SHEET_INDICATORS)
     
     if has_data:
         log.info(f"✅ Sheet '{worksheet.title}' has HARA indicators")
@@ -194,27 +408,14 @@ def has_required_hara_columns(worksheet):
     Checks rows 1-10 to find the actual header row.
     """
     
-    if worksheet.max_row < 2:
-        log.debug(f"  Sheet '{worksheet.title}': Too few rows ({worksheet.max_row})")
+    rows = read_leading_rows(worksheet)
+    if len(rows) < 2:
+        log.debug(f"  Sheet '{worksheet.title}': Too few rows ({len(rows)})")
         return False
     
     # Check rows 1-10 for headers (sometimes multiple title/empty rows)
-    for row_idx in range(1, min(11, worksheet.max_row + 1)):
-        headers = [str(cell.value).lower().strip() if cell.value else '' 
-                   for cell in worksheet[row_idx]]
-        
-        # Skip completely empty rows
-        non_empty = [h for h in headers if h]
-        if len(non_empty) == 0:
-            log.debug(f"  Row {row_idx}: Empty row, skipping")
-            continue
-        
-        # Skip if this looks like a title row (single cell with content, rest empty)
-        if len(non_empty) == 1:
-            log.debug(f"  Row {row_idx}: Title row - {non_empty[0][:50]}")
-            continue
-        
-        log.info(f"  📋 Sheet '{worksheet.title}' Row {row_idx} headers: {non_empty[:10]}")
+    for row_idx, headers in iter_header_candidates(rows):
+        log.debug(f"  📋 Sheet '{worksheet.title}' Row {row_idx} headers: {[h for h in headers if h][:10]}")
         
         # Must have ASIL column
         has_asil = any('asil' in h for h in headers)
@@ -223,15 +424,14 @@ def has_required_hara_columns(worksheet):
         has_sg = any(
             'safety goal' in h or 
             'safetygoal' in h or 
-            'safety goals' in h or
             h == 'goal' or
             h == 'sg' for h in headers
         )
         
         # Alternative: Check for S, E, C columns (indicates HARA table structure)
-        has_sec = all(h in headers for h in ['s', 'e', 'c'])
+        has_sec = SEC_HEADERS.issubset(headers)
         
-        log.info(f"  🔍 Row {row_idx}: has_asil={has_asil}, has_sg={has_sg}, has_SEC={has_sec}")
+        log.debug(f"  🔍 Row {row_idx}: has_asil={has_asil}, has_sg={has_sg}, has_SEC={has_sec}")
         
         # Accept if has ASIL and Safety Goal, OR if has S/E/C structure
         if (has_asil and has_sg) or has_sec:
@@ -252,24 +452,47 @@ def parse_hara_worksheet(worksheet):
     
     log.info(f"📊 Parsing worksheet: {worksheet.title}")
     
+    hara_data = list(iter_hara_rows(worksheet))
+    
+    log.info(f"✅ Parsed {len(hara_data)} valid rows from worksheet")
+    
+    if hara_data:
+        log.info(f"📝 First row sample keys: {[k for k in hara_data[0].keys() if hara_data[0].get(k)][:10]}")
+    
+    return hara_data
+
+
+def iter_hara_rows(worksheet):
+    """
+    Yield the meaningful HARA rows of a worksheet one at a time.
+    Rows are produced as the sheet is streamed, so parse_safety_goals
+    can consume a large sheet without holding every row dict at once.
+    Yields nothing if no header row is found.
+    """
+    
     # Find the header row (could be row 1, 2, or 3)
     header_row_idx = find_header_row(worksheet)
     
     if not header_row_idx:
         log.error("❌ No header row found in worksheet")
-        return None
+        return
     
     log.info(f"✅ Using header row: {header_row_idx}")
     
-    # Get headers from detected row
+    # Get headers from detected row (within the rows already read for detection)
+    header_row = read_leading_rows(worksheet)[header_row_idx - 1]
     headers = []
-    for cell in worksheet[header_row_idx]:
-        header = str(cell.value).strip() if cell.value else ''
+    for value in header_row:
+        header = str(value).strip() if value else ''
         headers.append(header)
     
+    # Columns past the last named header are never stored, so don't read them
+    while headers and not headers[-1]:
+        headers.pop()
+    
     if not headers:
         log.error("❌ No headers found in HARA worksheet")
-        return None
+        return
     
     log.info(f"📋 Found {len(headers)} headers: {[h for h in headers if h]}")
     
@@ -277,36 +500,42 @@ def parse_hara_worksheet(worksheet):
     column_map = create_column_mapping(headers)
     log.info(f"🗺️ Column mapping created: {len(column_map)} mappings")
     
+    # Resolve each column's row key once, not per cell: the standardized key
+    # for mapped headers, the original header otherwise. If several headers
+    # map to the same key, the first one gets it and the others keep their
+    # original names, so the field synonyms in HARA_FIELD_KEYS can still reach them.
+    row_keys = []
+    for header in headers:
+        std_key = column_map.get(header)
+        row_keys.append(std_key if std_key and std_key not in row_keys else header)
+    row_keys = tuple(row_keys)
+    
+    # Stream data rows once (random cell access re-reads the sheet XML in
+    # read-only mode), limited to the header columns: stray formatting can
+    # stretch a sheet's used range far to the right of the HARA table
+    rows = worksheet.iter_rows(min_row=header_row_idx + 1, max_col=len(headers), values_only=True)
+    
     # Parse data rows (start from row after headers)
-    hara_data = []
-    for row_idx in range(header_row_idx + 1, worksheet.max_row + 1):
-        row_data = {}
+    blank_streak = 0
+    for row_idx, row in enumerate(rows, start=header_row_idx + 1):
+        # Formatted-but-empty rows often pad a sheet to thousands of rows
+        if not any(row):
+            blank_streak += 1
+            if blank_streak > HARA_BLANK_ROW_LIMIT:
+                log.debug(f"⏹️ Row {row_idx}: over {HARA_BLANK_ROW_LIMIT} blank rows, end of table")
+                break
+            continue
+        blank_streak = 0
         
-        for col_idx, header in enumerate(headers, 1):
-            cell_value = worksheet.cell(row=row_idx, column=col_idx).value
-            
-            # Store with both original header and standardized key
-            if header:
-                row_data[header] = cell_value
-            
-            # Add standardized keys based on mapping
-            std_key = column_map.get(header)
-            if std_key:
-                row_data[std_key] = cell_value
+        # One cell per key: standardized where mapped, original header otherwise
+        row_data = dict(zip(row_keys, row))
+        row_data.pop('', None)  # Unnamed columns
         
         # Only add row if it has meaningful data
         if has_meaningful_data(row_data):
-            hara_data.append(row_data)
-            log.debug(f"✅ Row {row_idx}: ASIL={row_data.get('ASIL')}, SG={str(row_data.get('Safety Goal', 'N/A'))[:50]}")
+            yield row_data
         else:
             log.debug(f"⚠️ Row {row_idx}: Skipped (no meaningful data)")
-    
-    log.info(f"✅ Parsed {len(hara_data)} valid rows from worksheet")
-    
-    if hara_data:
-        log.info(f"📝 First row sample keys: {[k for k in hara_data[0].keys() if hara_data[0].get(k)][:10]}")
-    
-    return hara_data
 
 
 def find_header_row(worksheet):
@@ -320,29 +549,14 @@ def find_header_row(worksheet):
     
     log.info(f"  🔍 Searching for header row in sheet '{worksheet.title}'")
     
-    for row_idx in range(1, min(11, worksheet.max_row + 1)):
-        headers = [str(cell.value).lower().strip() if cell.value else '' 
-                   for cell in worksheet[row_idx]]
-        
-        # Skip completely empty rows
-        non_empty = [h for h in headers if h]
-        if len(non_empty) == 0:
-            log.debug(f"    Row {row_idx}: Empty, skipping")
-            continue
-        
-        # Skip if this looks like a title row (single cell with content)
-        if len(non_empty) == 1:
-            log.debug(f"    Row {row_idx}: Title - '{non_empty[0][:50]}'")
-            continue
-        
-        # Log what we found
-        log.info(f"    Row {row_idx}: {non_empty[:8]}")
+    rows = read_leading_rows(worksheet)
+    
+    for row_idx, headers in iter_header_candidates(rows):
+        log.debug(f"    Row {row_idx}: {[h for h in headers if h][:8]}")
         
         # Check if this row has HARA indicators
-        has_hara_indicators = any(
-            indicator in ' '.join(headers) 
-            for indicator in ['asil', 'safety goal', 'hazard', 'severity', 'exposure', 'controllability']
-        )
+        header_text = ' '.join(headers)
+        has_hara_indicators = any(indicator in header_text for indicator in HARA_HEADER_INDICATORS)
         
         if has_hara_indicators:
             log.info(f"  ✅ Row {row_idx} looks like headers!")
@@ -351,13 +565,49 @@ def find_header_row(worksheet):
     log.error(f"  ❌ No header row found in rows 1-10 of sheet '{worksheet.title}'")
     log.error(f"  💡 Total rows in sheet: {worksheet.max_row}")
     log.error(f"  💡 First 3 rows content:")
-    for i in range(1, min(4, worksheet.max_row + 1)):
-        row_preview = [str(cell.value)[:30] if cell.value else '' for cell in worksheet[i]]
+    for i, row in enumerate(rows[:3], start=1):
+        row_preview = [str(value)[:30] if value else '' for value in row]
         log.error(f"     Row {i}: {[c for c in row_preview if c][:5]}")
     
     return None
 
 
+# Header classification rules, checked in order; the first rule whose keywords
+# match decides the header. Columns:
+#   keywords - substrings of the lower-cased header (or whole-header values if exact)
+#   exact    - match the whole header instead of a substring
+#   std_key  - standardized key the column is mapped to
+#   required - if set, one of these must also occur or the header stays unmapped
+HEADER_COLUMN_RULES = (
+    (('hazard id', 'hazard_id', 'haz id', 'haz-id', 'id'), False, 'Hazard ID', ('hazard', 'haz')),
+    (('function', 'item', 'system', 'component'), False, 'Function/Item', None),
+    (('hazardous event', 'hazard event', 'event'), False, 'Hazardous Event', None),
+    (('operational situation', 'operation', 'situation', 'scenario'), False, 'Operational Situation', None),
+    (('s', 'severity', 'sev', 's class'), True, 'S', None),
+    (('e', 'exposure', 'exp', 'e class'), True, 'E', None),
+    (('c', 'controllability', 'control', 'ctrl', 'c class'), True, 'C', None),
+    (('asil', 'asil rating', 'asil level'), False, 'ASIL', None),
+    (('safety goal', 'safetygoal', 'sg', 'goal'), False, 'Safety Goal', ('safety',)),
+    (('safe state', 'safestate', 'ss'), False, 'Safe State', None),
+    (('ftti', 'fault tolerant time', 'time interval'), False, 'FTTI', None),
+)
+
+
+@functools.lru_cache(maxsize=256)
+def classify_header(header_lower):
+    """
+    Standardized key for a lower-cased, stripped header, or None.
+    Cached: the same headers recur across sheets and files.
+    """
+    
+    for keywords, exact, std_key, required in HEADER_COLUMN_RULES:
+        if header_lower in keywords if exact else any(k in header_lower for k in keywords):
+            if required is None or any(r in header_lower for r in required):
+                return std_key
+            return None
+    return None
+
+
 def create_column_mapping(headers):
     """
     Create flexible column mapping to handle various naming conventions.
@@ -369,66 +619,12 @@ def create_column_mapping(headers):
     for header in headers:
         if not header:
             continue
-            
-        header_lower = header.lower().strip()
-        
-        # Hazard ID
-        if any(x in header_lower for x in ['hazard id', 'hazard_id', 'haz id', 'haz-id', 'id']):
-            if 'hazard' in header_lower or 'haz' in header_lower:
-                column_map[header] = 'Hazard ID'
-                log.debug(f"  Map '{header}' -> 'Hazard ID'")
-        
-        # Function / Item
-        elif any(x in header_lower for x in ['function', 'item', 'system', 'component']):
-            column_map[header] = 'Function/Item'
-            log.debug(f"  Map '{header}' -> 'Function/Item'")
-        
-        # Hazardous Event
-        elif any(x in header_lower for x in ['hazardous event', 'hazard event', 'event']):
-            column_map[header] = 'Hazardous Event'
-            log.debug(f"  Map '{header}' -> 'Hazardous Event'")
-        
-        # Operational Situation
-        elif any(x in header_lower for x in ['operational situation', 'operation', 'situation', 'scenario']):
-            column_map[header] = 'Operational Situation'
-            log.debug(f"  Map '{header}' -> 'Operational Situation'")
-        
-        # Severity
-        elif header_lower in ['s', 'severity', 'sev', 's class']:
-            column_map[header] = 'S'
-            log.debug(f"  Map '{header}' -> 'S'")
-        
-        # Exposure
-        elif header_lower in ['e', 'exposure', 'exp', 'e class']:
-            column_map[header] = 'E'
-            log.debug(f"  Map '{header}' -> 'E'")
         
-        # Controllability
-        elif header_lower in ['c', 'controllability', 'control', 'ctrl', 'c class']:
-            column_map[header] = 'C'
-            log.debug(f"  Map '{header}' -> 'C'")
-        
-        # ASIL
-        elif any(x in header_lower for x in ['asil', 'asil rating', 'asil level']):
-            column_map[header] = 'ASIL'
-            log.debug(f"  Map '{header}' -> 'ASIL'")
-        
-        # Safety Goal
-        elif any(x in header_lower for x in ['safety goal', 'safetygoal', 'sg', 'goal']):
-            if 'safety' in header_lower:
-                column_map[header] = 'Safety Goal'
-                log.debug(f"  Map '{header}' -> 'Safety Goal'")
-        
-        # Safe State
-        elif any(x in header_lower for x in ['safe state', 'safestate', 'ss']):
-            column_map[header] = 'Safe State'
-            log.debug(f"  Map '{header}' -> 'Safe State'")
-        
-        # FTTI
-        elif any(x in header_lower for x in ['ftti', 'fault tolerant time', 'time interval']):
-            column_map[header] = 'FTTI'
-            log.debug(f"  Map '{header}' -> 'FTTI'")
+        std_key = classify_header(header.lower().strip())
+        if std_key:
+            column_map[header] = std_key
     
+    log.debug(f"  Column mapping: {column_map}")
     return column_map
 
 
@@ -438,23 +634,42 @@ def has_meaningful_data(row_data):
     """
     
     # Check for ASIL or Safety Goal
-    asil = str(row_data.get('ASIL', '')).strip().upper()
     safety_goal = str(row_data.get('Safety Goal', '')).strip()
     
-    # Clean ASIL value
-    asil_clean = asil.replace('ASIL', '').replace('ASIL-', '').replace('-', '').strip()
-    
     # Row is meaningful if it has a valid ASIL or substantial Safety Goal
-    has_valid_asil = asil_clean in ['A', 'B', 'C', 'D', 'QM']
+    has_valid_asil = normalize_asil(row_data.get('ASIL', '')) is not None
     has_valid_sg = len(safety_goal) > 5 and safety_goal.lower() not in ['safety goal', 'n/a', 'tbd']
     
     return has_valid_asil or has_valid_sg
 
 
+# Column headers accepted for each safety goal field, in priority order.
+# Standardized keys from create_column_mapping come first.
+HARA_FIELD_KEYS = {
+    'asil': ('ASIL', 'asil', 'ASIL Rating', 'ASIL Level'),
+    'safety_goal': ('Safety Goal', 'SafetyGoal', 'Safety Goals', 'Goal', 'SG', 'Safety Requirement'),
+    'safe_state': ('Safe State', 'SafeState', 'SS'),
+    'ftti': ('FTTI', 'Fault Tolerant Time Interval', 'Time Interval', 'Reaction Time', 'Response Time'),
+    'hazard_id': ('Hazard ID', 'Hazard_ID', 'HazardID', 'Haz ID', 'ID'),
+    'hazardous_event': ('Hazardous Event', 'Hazard Event', 'Event', 'Hazard', 'Hazard Description'),
+    'operational_situation': ('Operational Situation', 'Operating Situation', 'Situation', 'Scenario', 'Operating Mode'),
+}
+
+
+def resolve_hara_keys(row):
+    """
+    Narrow HARA_FIELD_KEYS to the column headers present in a row,
+    keeping their priority order.
+    """
+    
+    return {field: tuple(key for key in keys if key in row) for field, keys in HARA_FIELD_KEYS.items()}
+
+
 def parse_safety_goals(hara_data):
     """
     Parse safety goals from HARA data.
     Robust parsing handling various formats and missing data.
+    Accepts a row list or a row iterator (e.g. iter_hara_rows) in one pass.
     
     Per ISO 26262-3:2018, 7.4.2.2:
     At least one FSR shall be derived from each safety goal.
@@ -464,17 +679,44 @@ def parse_safety_goals(hara_data):
         log.error("❌ No HARA data to parse")
         return []
     
-    log.info(f"🔍 Parsing {len(hara_data)} HARA rows for safety goals")
+    log.info("🔍 Parsing HARA rows for safety goals")
     
-    safety_goals = []
-    sg_counter = 1
+    # IDs follow the order of the qualifying rows: SG-001, SG-002, ...
+    safety_goals = [
+        build_safety_goal(sg_number, row, field_keys, asil, safety_goal_text)
+        for sg_number, (row, field_keys, asil, safety_goal_text)
+        in enumerate(iter_safety_goal_rows(hara_data), start=1)
+    ]
+    
+    log.info(f"✅ Parsed {len(safety_goals)} safety goals")
+    
+    if len(safety_goals) == 0:
+        log.error("❌ No safety goals with ASIL A/B/C/D found in HARA")
+        log.error("💡 Check that your HARA file has:")
+        log.error("  1. An 'ASIL' column with values A, B, C, or D")
+        log.error("  2. A 'Safety Goal' column with meaningful text")
+    
+    return safety_goals
+
+
+def iter_safety_goal_rows(hara_data):
+    """
+    Yield (row, field_keys, asil, safety_goal_text) for each HARA row that
+    defines a safety goal: ASIL A-D and a meaningful goal text.
+    """
+    
+    idx = 0
+    columns = None
     
     for idx, row in enumerate(hara_data, start=1):
-        log.debug(f"📝 Processing row {idx}")
+        # Rows of one HARA table share their columns: resolve the field
+        # synonyms once, not on every row
+        if row.keys() != columns:
+            columns = row.keys()
+            field_keys = resolve_hara_keys(row)
         
         # Extract and validate ASIL
-        asil = extract_asil(row)
-        log.debug(f"  ASIL: {asil}")
+        asil = extract_asil(row, field_keys['asil'])
         
         if not asil:
             log.debug(f"  ⚠️ Row {idx}: No valid ASIL found")
@@ -485,207 +727,155 @@ def parse_safety_goals(hara_data):
             continue
         
         # Extract safety goal
-        safety_goal_text = extract_safety_goal(row)
-        log.debug(f"  Safety Goal: {safety_goal_text[:50] if safety_goal_text else 'None'}...")
+        safety_goal_text = extract_safety_goal(row, field_keys['safety_goal'])
         
         if not safety_goal_text:
             log.warning(f"⚠️ Row {idx} has ASIL {asil} but no safety goal - skipping")
             continue
         
-        # Generate SG ID
-        sg_id = f"SG-{sg_counter:03d}"
-        
-        # Extract other fields with fallbacks
-        safe_state = extract_safe_state(row)
-        ftti = extract_ftti(row)
-        hazard_id = extract_hazard_id(row, sg_counter)
-        
-        # Create safety goal object
-        safety_goal = {
-            'id': sg_id,
-            'description': safety_goal_text,
-            'asil': asil,
-            'safe_state': safe_state,
-            'ftti': ftti,
-            'hazard_id': hazard_id,
-            'severity': extract_parameter(row, 'S', 'Severity'),
-            'exposure': extract_parameter(row, 'E', 'Exposure'),
-            'controllability': extract_parameter(row, 'C', 'Controllability'),
-            'hazardous_event': extract_hazardous_event(row),
-            'operational_situation': extract_operational_situation(row)
-        }
-        
-        safety_goals.append(safety_goal)
-        log.info(f"✅ Parsed {sg_id}: {asil} - {safety_goal_text[:60]}...")
-        sg_counter += 1
+        yield row, field_keys, asil, safety_goal_text
     
-    log.info(f"✅ Parsed {len(safety_goals)} safety goals from HARA data")
+    log.info(f"📊 Scanned {idx} HARA rows")
+
+
+def build_safety_goal(sg_number, row, field_keys, asil, safety_goal_text):
+    """
+    Create the safety goal entry for a qualifying HARA row.
+    """
     
-    if len(safety_goals) == 0:
-        log.error("❌ No safety goals with ASIL A/B/C/D found in HARA")
-        log.error("💡 Check that your HARA file has:")
-        log.error("  1. An 'ASIL' column with values A, B, C, or D")
-        log.error("  2. A 'Safety Goal' column with meaningful text")
+    sg_id = f"SG-{sg_number:03d}"
     
-    return safety_goals
+    safety_goal = {
+        'id': sg_id,
+        'description': safety_goal_text,
+        'asil': asil,
+        'safe_state': extract_safe_state(row, field_keys['safe_state']),
+        'ftti': extract_ftti(row, field_keys['ftti']),
+        'hazard_id': extract_hazard_id(row, sg_number, field_keys['hazard_id']),
+        'severity': extract_parameter(row, 'S', 'Severity'),
+        'exposure': extract_parameter(row, 'E', 'Exposure'),
+        'controllability': extract_parameter(row, 'C', 'Controllability'),
+        'hazardous_event': extract_hazardous_event(row, field_keys['hazardous_event']),
+        'operational_situation': extract_operational_situation(row, field_keys['operational_situation'])
+    }
+    
+    log.info(f"✅ Parsed {sg_id}: {asil} - {safety_goal_text[:60]}...")
+    return safety_goal
 
 
-def extract_asil(row):
+def extract_asil(row, keys=HARA_FIELD_KEYS['asil']):
     """
     Extract ASIL from row with flexible key matching.
     """
     
-    possible_keys = ['ASIL', 'asil', 'ASIL Rating', 'ASIL Level']
-    
-    for key in possible_keys:
-        if key in row and row[key]:
-            asil = str(row[key]).strip().upper()
-            asil = asil.replace('ASIL', '').replace('ASIL-', '').replace('-', '').strip()
-            if asil in ['A', 'B', 'C', 'D', 'QM']:
+    for key in keys:
+        value = row.get(key)
+        if value:
+            asil = normalize_asil(value)
+            if asil:
                 return asil
     
     return None
 
 
-def extract_safety_goal(row):
+@functools.lru_cache(maxsize=256)
+def normalize_asil(value):
     """
-    Extract safety goal text with flexible key matching.
+    Normalize an ASIL cell ("ASIL B", "asil-b", "B", "QM") to A/B/C/D/QM.
+    Returns None for anything else.
+    
+    Cached: an ASIL column only holds a handful of distinct values,
+    so each one is cleaned once per process instead of once per row.
     """
     
-    possible_keys = [
-        'Safety Goal', 
-        'SafetyGoal', 
-        'Safety Goals',
-        'Goal', 
-        'SG',
-        'Safety Requirement'
-    ]
+    asil = str(value).strip().upper()
+    asil = asil.replace('ASIL', '').replace('ASIL-', '').replace('-', '').strip()
+    return asil if asil in HARA_RATINGS else None
+
+
+# Cell texts treated as "no value" in HARA fields
+HARA_PLACEHOLDER_VALUES = frozenset(('N/A', 'TBD', '-', 'None'))
+
+# Lower-cased safety goal cells that are headers or placeholders, not goals
+SAFETY_GOAL_PLACEHOLDERS = frozenset(('safety goal', 'n/a', 'tbd', 'none'))
+
+
+def first_hara_value(row, keys, accept=None):
+    """
+    Stripped text of the first usable cell among keys, in priority order.
+    A cell is usable if accept(text) holds, or by default if it is not a
+    placeholder (N/A, TBD, ...). Returns None if no cell qualifies.
+    """
     
-    for key in possible_keys:
-        if key in row and row[key]:
-            text = str(row[key]).strip()
-            if len(text) > 5 and text.lower() not in ['safety goal', 'n/a', 'tbd', 'none']:
+    for key in keys:
+        value = row.get(key)
+        if value:
+            text = str(value).strip()
+            if text and (accept(text) if accept else text not in HARA_PLACEHOLDER_VALUES):
                 return text
     
     return None
 
 
-def extract_safe_state(row):
+def is_safety_goal_text(text):
+    """Goal text long enough to be a real goal and not a header/placeholder"""
+    return len(text) > 5 and text.lower() not in SAFETY_GOAL_PLACEHOLDERS
+
+
+def is_descriptive_text(text):
+    """Longer than an abbreviation or code"""
+    return len(text) > 5
+
+
+def extract_safety_goal(row, keys=HARA_FIELD_KEYS['safety_goal']):
+    """
+    Extract safety goal text with flexible key matching.
+    """
+    return first_hara_value(row, keys, is_safety_goal_text)
+
+
+def extract_safe_state(row, keys=HARA_FIELD_KEYS['safe_state']):
     """
     Extract safe state with fallback to default.
     Per ISO 26262-3:2018, 7.4.2.5
     """
-    
-    possible_keys = ['Safe State', 'SafeState', 'SS']
-    
-    for key in possible_keys:
-        if key in row and row[key]:
-            text = str(row[key]).strip()
-            if text and text not in ['N/A', 'TBD', '-', 'None']:
-                return text
-    
-    return "To be specified per ISO 26262-3:2018, 7.4.2.5"
+    return first_hara_value(row, keys) or "To be specified per ISO 26262-3:2018, 7.4.2.5"
 
 
-def extract_ftti(row):
+def extract_ftti(row, keys=HARA_FIELD_KEYS['ftti']):
     """
     Extract FTTI with flexible format support.
     Per ISO 26262-3:2018, 7.4.2.4.b
     """
-    
-    possible_keys = [
-        'FTTI', 
-        'Fault Tolerant Time Interval', 
-        'Time Interval',
-        'Reaction Time',
-        'Response Time'
-    ]
-    
-    for key in possible_keys:
-        if key in row and row[key]:
-            ftti_value = str(row[key]).strip()
-            if ftti_value and ftti_value not in ['N/A', 'TBD', '-', '', 'None']:
-                return ftti_value
-    
-    return "To be determined per ISO 26262-3:2018, 7.4.2.4.b"
+    return first_hara_value(row, keys) or "To be determined per ISO 26262-3:2018, 7.4.2.4.b"
 
 
-def extract_hazard_id(row, counter):
+def extract_hazard_id(row, counter, keys=HARA_FIELD_KEYS['hazard_id']):
     """
     Extract hazard ID with fallback generation.
     """
-    
-    possible_keys = ['Hazard ID', 'Hazard_ID', 'HazardID', 'Haz ID', 'ID']
-    
-    for key in possible_keys:
-        if key in row and row[key]:
-            haz_id = str(row[key]).strip()
-            if haz_id and haz_id not in ['N/A', 'TBD', '-', 'None']:
-                return haz_id
-    
-    return f"H-{counter:03d}"
+    return first_hara_value(row, keys) or f"H-{counter:03d}"
 
 
 def extract_parameter(row, short_key, long_key):
     """
     Extract S, E, or C parameter.
     """
-    
-    if short_key in row and row[short_key]:
-        value = str(row[short_key]).strip()
-        if value and value not in ['N/A', 'TBD', '-', 'None']:
-            return value
-    
-    if long_key in row and row[long_key]:
-        value = str(row[long_key]).strip()
-        if value and value not in ['N/A', 'TBD', '-', 'None']:
-            return value
-    
-    return ''
+    return first_hara_value(row, (short_key, long_key)) or ''
 
 
-def extract_hazardous_event(row):
+def extract_hazardous_event(row, keys=HARA_FIELD_KEYS['hazardous_event']):
     """
     Extract hazardous event description.
     """
-    
-    possible_keys = [
-        'Hazardous Event',
-        'Hazard Event',
-        'Event',
-        'Hazard',
-        'Hazard Description'
-    ]
-    
-    for key in possible_keys:
-        if key in row and row[key]:
-            text = str(row[key]).strip()
-            if len(text) > 5:
-                return text
-    
-    return 'Not specified'
+    return first_hara_value(row, keys, is_descriptive_text) or 'Not specified'
 
 
-def extract_operational_situation(row):
+def extract_operational_situation(row, keys=HARA_FIELD_KEYS['operational_situation']):
     """
     Extract operational situation.
     """
-    
-    possible_keys = [
-        'Operational Situation',
-        'Operating Situation',
-        'Situation',
-        'Scenario',
-        'Operating Mode'
-    ]
-    
-    for key in possible_keys:
-        if key in row and row[key]:
-            text = str(row[key]).strip()
-            if text and text not in ['N/A', 'TBD', '-', 'None']:
-                return text
-    
-    return 'General operation'
+    return first_hara_value(row, keys) or 'General operation'
 
 
 def validate_hara_data(safety_goals):
@@ -704,7 +894,7 @@ def validate_hara_data(safety_goals):
     for sg in safety_goals:
         sg_id = sg.get('id', 'Unknown')
         
-        if sg.get('asil') not in ['A', 'B', 'C', 'D']:
+        if sg.get('asil') not in ASIL_LEVELS:
             issues.append(f"{sg_id}: Invalid ASIL '{sg.get('asil')}'")
         
         if not sg.get('description') or len(sg.get('description', '')) < 10:
@@ -733,23 +923,20 @@ def format_safety_goals_summary(safety_goals):
     if not safety_goals:
         return "No safety goals found"
     
-    summary = f"Total Safety Goals: {len(safety_goals)}\n\n"
+    parts = [f"Total Safety Goals: {len(safety_goals)}\n\n"]
     
     # Group by ASIL
     by_asil = {}
     for sg in safety_goals:
-        asil = sg.get('asil', 'Unknown')
-        if asil not in by_asil:
-            by_asil[asil] = []
-        by_asil[asil].append(sg)
+        by_asil.setdefault(sg.get('asil', 'Unknown'), []).append(sg)
     
     # Display by ASIL level (D -> C -> B -> A)
-    for asil in ['D', 'C', 'B', 'A']:
-        if asil in by_asil:
-            summary += f"\n**ASIL {asil}** ({len(by_asil[asil])} goals):\n"
-            for sg in by_asil[asil][:5]:
-                summary += f"- {sg['id']}: {sg['description'][:80]}...\n"
-            if len(by_asil[asil]) > 5:
-                summary += f"  ... and {len(by_asil[asil]) - 5} more\n"
-    
-    return summary
\ No newline at end of file
+    for asil in ('D', 'C', 'B', 'A'):
+        goals = by_asil.get(asil)
+        if goals:
+            parts.append(f"\n**ASIL {asil}** ({len(goals)} goals):\n")
+            parts.extend(f"- {sg['id']}: {sg['description'][:80]}...\n" for sg in goals[:5])
+            if len(goals) > 5:
+                parts.append(f"  ... and {len(goals) - 5} more\n")
+    
+    return "".join(parts)
\ No newline at end of file